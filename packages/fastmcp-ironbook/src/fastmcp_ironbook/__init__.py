@@ -6,18 +6,58 @@ Provides Iron Book agent-based security for FastMCP servers.
 
 __version__ = "0.1.0"
 
-from .middleware import ClientInfoMiddleware
-from .agent import get_or_register_agent, identify_agent, extract_agent_capabilities
-from .policy import enforce_policy
-from .decorator import setup, require_policy
+from .middleware import ClientInfoMiddleware, IronBookPolicyMiddleware
+from .agent import AgentInfo, RegistrationUnavailableError, UnknownSessionError, get_or_register_agent, identify_agent, extract_agent_capabilities
+from .policy import enforce_policy, PolicyContext, DecisionBatcher
+from .decorator import setup, require_policy, get_default_guard
+from .guard import IronBookGuard, ToolPolicy
+from .cache import OrgSettingsCache, DecisionCache, RegistrationBackoff
+from .tokens import TokenPool
+from .breaker import CircuitBreaker, CircuitOpenError
+from .deadline import Deadline, DeadlineExceededError
+from .hedging import RequestHedger
+from .limiter import AdaptiveLimiter, LoadShedError
+from .metrics import IronBookMetrics
+from .scheduler import UpstreamScheduler
+from .registry import AgentRegistry, BoundedAgentRegistry, SQLiteAgentRegistry
+from .local import LocalPolicyEvaluator, PolicyBundleStore, RegoPolicy, RegoError
 
 __all__ = [
     "ClientInfoMiddleware",
+    "IronBookPolicyMiddleware",
+    "AgentInfo",
+    "RegistrationUnavailableError",
+    "UnknownSessionError",
     "get_or_register_agent",
     "identify_agent",
     "extract_agent_capabilities",
     "enforce_policy",
+    "PolicyContext",
+    "DecisionBatcher",
     "setup",
     "require_policy",
+    "get_default_guard",
+    "IronBookGuard",
+    "ToolPolicy",
+    "OrgSettingsCache",
+    "DecisionCache",
+    "RegistrationBackoff",
+    "TokenPool",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "Deadline",
+    "DeadlineExceededError",
+    "RequestHedger",
+    "AdaptiveLimiter",
+    "LoadShedError",
+    "IronBookMetrics",
+    "UpstreamScheduler",
+    "AgentRegistry",
+    "BoundedAgentRegistry",
+    "SQLiteAgentRegistry",
+    "LocalPolicyEvaluator",
+    "PolicyBundleStore",
+    "RegoPolicy",
+    "RegoError",
 ]
 
@@ -1,13 +1,134 @@
 """Agent identification and registration with Iron Book."""
 
+import asyncio
 import logging
-from typing import Optional, Tuple
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
+from typing import Any, Iterator, Optional, Tuple
 from ironbook_sdk import IronBookClient, RegisterAgentOptions
+from .cache import OrgSettingsCache, RegistrationBackoff
+from .concurrency import SingleFlight
+from .deadline import Deadline, DeadlineExceededError, within
+from .scheduler import UpstreamScheduler, scheduled
+from .session import DEFAULT_SESSION_KEY, current_session_id
 
 logger = logging.getLogger(__name__)
 
+# Shared org settings cache used when callers do not provide their own
+_default_org_settings_cache = OrgSettingsCache()
 
-def identify_agent(client_info_cache: dict) -> Tuple[str, str, Optional[str], str]:
+# Registrations in flight, keyed by (registry, agent_key)
+_default_registration_flights = SingleFlight()
+
+# Recent registration failures, keyed like the flights
+_default_registration_backoff = RegistrationBackoff()
+
+# Background re-registrations of degraded agents (kept referenced until done)
+_retry_tasks: set = set()
+
+
+class UnknownSessionError(PermissionError):
+    """
+    Raised when an MCP session has no cached client info.
+    
+    The agent of such a session cannot be identified, and the call is
+    denied rather than attributed to another client's agent. This happens if
+    ClientInfoMiddleware is not installed, or the client sent no name in its
+    clientInfo.
+    """
+
+
+class RegistrationUnavailableError(RuntimeError):
+    """
+    Raised while an agent's registration is backing off after a failure.
+    
+    The error is retryable: registration is attempted again once
+    `retry_after` seconds have passed.
+    """
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True, slots=True)
+class AgentInfo(Mapping):
+    """
+    A registered agent's identity, as used for policy decisions.
+    
+    Instances are immutable, so registry entries are shared between tool
+    calls without copying. For backward compatibility an AgentInfo is also a
+    read-only mapping with the keys of the agent info dicts returned by
+    earlier versions; optional fields that are unset (trust_score, status,
+    note, policy_enforcement_available) are absent from the mapping.
+    """
+    
+    agent_did: str
+    developer_did: Optional[str] = None
+    vc: Any = field(default=None, repr=False)
+    agent_name: Optional[str] = None
+    agent_version: Optional[str] = None
+    capabilities: Tuple[str, ...] = ()
+    identification_method: Optional[str] = None
+    org_id: Optional[str] = None
+    trust_score: Any = None
+    status: Optional[str] = None
+    note: Optional[str] = None
+    policy_enforcement_available: Optional[bool] = None
+    
+    @classmethod
+    def from_mapping(cls, data: Mapping) -> "AgentInfo":
+        """
+        Build an AgentInfo from an agent info dict (unknown keys are ignored).
+        
+        Args:
+            data: Agent info mapping; an AgentInfo is returned unchanged
+        
+        Returns:
+            The AgentInfo
+        """
+        if isinstance(data, cls):
+            return data
+        values = {name: data[name] for name in _AGENT_INFO_FIELDS if name in data}
+        values["capabilities"] = tuple(values.get("capabilities") or ())
+        return cls(**values)
+    
+    def to_dict(self) -> dict:
+        """Return a mutable dict with the mapping view's keys."""
+        return dict(self)
+    
+    def __getitem__(self, key: str) -> Any:
+        if key in _AGENT_INFO_FIELDS:
+            value = getattr(self, key)
+            if value is not None or key not in _OPTIONAL_AGENT_INFO_FIELDS:
+                return value
+        raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return (
+            name for name in _AGENT_INFO_FIELDS
+            if name not in _OPTIONAL_AGENT_INFO_FIELDS or getattr(self, name) is not None
+        )
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+_AGENT_INFO_FIELDS = tuple(f.name for f in fields(AgentInfo))
+_OPTIONAL_AGENT_INFO_FIELDS = frozenset(
+    ("trust_score", "status", "note", "policy_enforcement_available")
+)
+
+
+def _lookup_client_info(client_info_cache: dict, session_id: Optional[str]) -> Optional[dict]:
+    """Return cached client info for a session, or the default slot outside a session."""
+    return client_info_cache.get(DEFAULT_SESSION_KEY if session_id is None else session_id)
+
+
+def identify_agent(
+    client_info_cache: dict,
+    session_id: Optional[str] = None
+) -> Tuple[str, str, Optional[str], str]:
     """
     Identify agent from MCP clientInfo (captured during initialize).
     
@@ -15,11 +136,18 @@ def identify_agent(client_info_cache: dict) -> Tuple[str, str, Optional[str], st
     
     Args:
         client_info_cache: Cache containing MCP client info
+        session_id: MCP session ID whose client info to use (None uses the
+                    "default" slot)
     
     Returns:
         Tuple of (agent_name, agent_key, client_version, identification_method)
+    
+    Raises:
+        UnknownSessionError: If session_id has no cached client info
     """
-    mcp_client = client_info_cache.get("default")
+    mcp_client = _lookup_client_info(client_info_cache, session_id)
+    if not mcp_client and session_id is not None:
+        raise UnknownSessionError(f"No MCP client info for session {session_id}; cannot identify agent")
     if mcp_client:
         client_name = mcp_client["name"].lower().replace(" ", "-")
         client_version = mcp_client.get("version")
@@ -36,7 +164,11 @@ def identify_agent(client_info_cache: dict) -> Tuple[str, str, Optional[str], st
     return ("unknown-agent", "unknown-agent", None, "default")
 
 
-def extract_agent_capabilities(client_info_cache: dict, agent_name: str) -> list:
+def extract_agent_capabilities(
+    client_info_cache: dict,
+    agent_name: str,
+    session_id: Optional[str] = None
+) -> list:
     """
     Extract capabilities from MCP client capabilities captured during initialize.
     
@@ -46,11 +178,12 @@ def extract_agent_capabilities(client_info_cache: dict, agent_name: str) -> list
     Args:
         client_info_cache: Cache containing MCP client info
         agent_name: Name of the agent
+        session_id: MCP session ID whose client info to use
     
     Returns:
         List of MCP capability names
     """
-    mcp_client = client_info_cache.get("default")
+    mcp_client = _lookup_client_info(client_info_cache, session_id)
     if mcp_client and "capabilities" in mcp_client:
         mcp_capabilities = mcp_client["capabilities"]
         if mcp_capabilities:
@@ -70,44 +203,183 @@ async def get_or_register_agent(
     ironbook_client: IronBookClient,
     client_info_cache: dict,
     agent_registry: dict,
-    developer_did: str = "did:web:identitymachines.com"
-) -> dict:
+    developer_did: str = "did:web:identitymachines.com",
+    org_settings_cache: Optional[OrgSettingsCache] = None,
+    registration_flights: Optional[SingleFlight] = None,
+    session_id: Optional[str] = None,
+    registration_backoff: Optional[RegistrationBackoff] = None,
+    deadline: Optional[Deadline] = None,
+    scheduler: Optional[UpstreamScheduler] = None,
+    priority: int = 0
+) -> AgentInfo:
     """
     Get or register an agent based on the client type.
     
     Agent identity is determined from MCP clientInfo.name captured during
     the initialize hook per MCP specification.
     
+    Concurrent calls for an agent that is not yet registered share a single
+    upstream registration; every caller awaits the same result.
+    
+    Failed registrations back off with jittered exponential delays: until the
+    delay has passed, calls fail fast with RegistrationUnavailableError
+    instead of hitting Iron Book again. Degraded entries (registered without
+    a VC) are re-registered in the background once their backoff expires,
+    and the entry is replaced when a VC is obtained.
+    
     Args:
         ironbook_client: Iron Book SDK client instance
         client_info_cache: Cache containing MCP client info
         agent_registry: Registry to cache agent registrations
         developer_did: Developer DID for agent registration
+        org_settings_cache: Cache for org settings (defaults to a shared cache)
+        registration_flights: Single-flight group for registrations
+                              (defaults to a shared group)
+        session_id: MCP session ID of the caller (defaults to the session of
+                    the current request)
+        registration_backoff: Negative cache for failed registrations
+                              (defaults to a shared one)
+        deadline: Optional deadline; the call stops waiting for registration
+                  when it passes. The registration itself is shared with
+                  concurrent callers and runs to completion.
+        scheduler: Optional upstream scheduler; registration calls wait for
+                   a slot in it, keyed by the agent key
+        priority: Scheduling priority of the registration (higher goes first)
     
     Returns:
-        Agent info dict for policy decisions
+        AgentInfo for policy decisions (shared with the registry; immutable)
+    
+    Raises:
+        UnknownSessionError: If the session has no cached client info
+        RegistrationUnavailableError: If a recent registration failed and the
+                                      agent is still backing off
+        DeadlineExceededError: If the deadline passes before registration
+                               completes
+    """
+    if session_id is None:
+        session_id = current_session_id()
+    
+    agent_name, agent_key, client_version, identification_method = identify_agent(
+        client_info_cache, session_id
+    )
+    
+    if org_settings_cache is None:
+        org_settings_cache = _default_org_settings_cache
+    if registration_flights is None:
+        registration_flights = _default_registration_flights
+    if registration_backoff is None:
+        registration_backoff = _default_registration_backoff
+    
+    flight_key = (id(agent_registry), agent_key)
+    
+    # Shared with concurrent callers, so not bound by this call's deadline
+    def register():
+        return _register_agent(
+            ironbook_client=ironbook_client,
+            client_info_cache=client_info_cache,
+            agent_registry=agent_registry,
+            developer_did=developer_did,
+            org_settings_cache=org_settings_cache,
+            registration_backoff=registration_backoff,
+            flight_key=flight_key,
+            agent_name=agent_name,
+            agent_key=agent_key,
+            client_version=client_version,
+            identification_method=identification_method,
+            session_id=session_id,
+            scheduler=scheduler,
+            priority=priority
+        )
+    
+    # Registry hits never need org settings; the org ID is already in the entry
+    if agent_key in agent_registry:
+        logger.info(f"Using cached agent registration for {agent_key}")
+        agent_info = agent_registry[agent_key]
+        if not isinstance(agent_info, AgentInfo):
+            # Entries put in the registry as plain dicts are converted once
+            agent_info = AgentInfo.from_mapping(agent_info)
+            agent_registry[agent_key] = agent_info
+        
+        if (
+            not agent_info.vc
+            and not registration_flights.in_flight(flight_key)
+            and registration_backoff.blocked(flight_key) is None
+        ):
+            logger.info(f"Retrying registration of degraded agent {agent_key} in the background")
+            task = asyncio.create_task(_retry_registration(registration_flights, flight_key, register))
+            _retry_tasks.add(task)
+            task.add_done_callback(_retry_tasks.discard)
+        return agent_info
+    
+    failure = registration_backoff.blocked(flight_key)
+    if failure is not None:
+        retry_after = registration_backoff.retry_after(flight_key)
+        raise RegistrationUnavailableError(
+            f"Agent registration for {agent_key} failed recently ({failure.error}); "
+            f"retrying in {retry_after:.1f}s",
+            retry_after
+        )
+    
+    return await within(
+        deadline, registration_flights.do(flight_key, register), "registration", record=False
+    )
+
+
+async def _retry_registration(registration_flights: SingleFlight, flight_key: tuple, register) -> None:
+    """Re-register a degraded agent; failures are recorded by _register_agent."""
+    try:
+        await registration_flights.do(flight_key, register)
+    except Exception as e:
+        logger.warning(f"Background re-registration failed: {e}")
+
+
+async def _register_agent(
+    ironbook_client: IronBookClient,
+    client_info_cache: dict,
+    agent_registry: dict,
+    developer_did: str,
+    org_settings_cache: OrgSettingsCache,
+    registration_backoff: RegistrationBackoff,
+    flight_key: tuple,
+    agent_name: str,
+    agent_key: str,
+    client_version: Optional[str],
+    identification_method: str,
+    session_id: Optional[str],
+    deadline: Optional[Deadline] = None,
+    scheduler: Optional[UpstreamScheduler] = None,
+    priority: int = 0
+) -> AgentInfo:
     """
-    agent_name, agent_key, client_version, identification_method = identify_agent(client_info_cache)
+    Register an agent with Iron Book and store it in the registry.
     
+    Runs at most once at a time per agent; see get_or_register_agent.
+    Failures, including degraded registrations without a VC, are recorded
+    in the backoff; a registration with a VC clears it. Running out of
+    budget is not a failure and is re-raised without being recorded.
+    
+    Returns:
+        AgentInfo stored in the registry
+    """
     # Fetch organization settings to get org ID
     try:
-        org_settings = await ironbook_client.get_org_settings()
+        org_settings = await within(deadline, org_settings_cache.get(ironbook_client), "org_settings")
         org_id = org_settings.org_id
         # Append org ID to agent name for better identification
         agent_name_with_org = f"{agent_name}-{org_id}"
         logger.info(f"Organization ID retrieved: {org_id}, agent name updated to: {agent_name_with_org}")
+    except DeadlineExceededError:
+        # Out of budget, not a failure: registering without the org ID would
+        # give the agent a different name
+        raise
     except Exception as e:
         logger.warning(f"Failed to fetch org settings: {e}. Using agent name without org ID.")
         agent_name_with_org = agent_name
         org_id = None
     
-    if agent_key in agent_registry:
-        logger.info(f"Using cached agent registration for {agent_name_with_org}")
-        return agent_registry[agent_key].copy()
-    
     logger.info(f"Registering new agent: {agent_name_with_org}")
     
-    capabilities = extract_agent_capabilities(client_info_cache, agent_name_with_org)
+    capabilities = extract_agent_capabilities(client_info_cache, agent_name_with_org, session_id)
     
     register_options = RegisterAgentOptions(
         agent_name=agent_name_with_org,
@@ -116,19 +388,27 @@ async def get_or_register_agent(
     )
     
     try:
-        registered = await ironbook_client.register_agent(register_options)
+        registered = await within(
+            deadline,
+            scheduled(
+                scheduler, lambda: ironbook_client.register_agent(register_options),
+                agent_key, priority
+            ),
+            "registration"
+        )
         
-        agent_info = {
-            "agent_did": registered["agentDid"],
-            "developer_did": registered["developerDid"],
-            "vc": registered["vc"],
-            "agent_name": agent_name_with_org,
-            "agent_version": client_version,
-            "capabilities": capabilities,
-            "identification_method": identification_method,
-            "org_id": org_id,
-        }
+        agent_info = AgentInfo(
+            agent_did=registered["agentDid"],
+            developer_did=registered["developerDid"],
+            vc=registered["vc"],
+            agent_name=agent_name_with_org,
+            agent_version=client_version,
+            capabilities=tuple(capabilities),
+            identification_method=identification_method,
+            org_id=org_id
+        )
         agent_registry[agent_key] = agent_info
+        registration_backoff.success(flight_key)
         
         logger.info(
             f"Successfully registered agent: {agent_info['agent_did']} "
@@ -136,6 +416,8 @@ async def get_or_register_agent(
         )
         return agent_info
         
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         error_msg = str(e)
         
@@ -149,48 +431,63 @@ async def get_or_register_agent(
             logger.info(f"Attempting to fetch agent with DID: {agent_did}")
             
             try:
-                existing_agent = await ironbook_client.get_agent(agent_did)
+                existing_agent = await within(
+                    deadline,
+                    scheduled(
+                        scheduler, lambda: ironbook_client.get_agent(agent_did),
+                        agent_key, priority
+                    ),
+                    "registration"
+                )
                 
                 logger.info(f"Successfully fetched existing agent: {existing_agent.did}")
                 
-                agent_info = {
-                    "agent_did": existing_agent.did,
-                    "developer_did": existing_agent.developer_did or developer_did,
-                    "vc": existing_agent.vc,
-                    "agent_name": agent_name_with_org,
-                    "agent_version": client_version,
-                    "capabilities": capabilities,
-                    "identification_method": identification_method,
-                    "trust_score": existing_agent.trust_score,
-                    "status": existing_agent.status,
-                    "org_id": org_id,
-                    "note": "Fetched existing agent from Iron Book with valid VC"
-                }
+                agent_info = AgentInfo(
+                    agent_did=existing_agent.did,
+                    developer_did=existing_agent.developer_did or developer_did,
+                    vc=existing_agent.vc,
+                    agent_name=agent_name_with_org,
+                    agent_version=client_version,
+                    capabilities=tuple(capabilities),
+                    identification_method=identification_method,
+                    trust_score=existing_agent.trust_score,
+                    status=existing_agent.status,
+                    org_id=org_id,
+                    note="Fetched existing agent from Iron Book with valid VC"
+                )
                 agent_registry[agent_key] = agent_info
+                registration_backoff.success(flight_key)
                 
                 logger.info(f"Policy enforcement available for {agent_name_with_org} with fetched VC")
                 return agent_info
                 
+            except DeadlineExceededError:
+                raise
             except Exception as fetch_error:
                 logger.error(f"Failed to fetch existing agent from Iron Book: {fetch_error}")
-                logger.warning(f"Creating agent info without VC - policy enforcement will be unavailable")
+                failure = registration_backoff.failure(flight_key, fetch_error)
+                logger.warning(
+                    f"Creating agent info without VC - policy enforcement will be unavailable "
+                    f"until a background retry succeeds (attempt {failure.attempts})"
+                )
                 
-                agent_info = {
-                    "agent_did": agent_did,
-                    "developer_did": developer_did,
-                    "vc": None,
-                    "agent_name": agent_name_with_org,
-                    "agent_version": client_version,
-                    "capabilities": capabilities,
-                    "identification_method": identification_method,
-                    "org_id": org_id,
-                    "note": f"Agent exists in Iron Book but fetch failed: {str(fetch_error)}. Policy enforcement disabled.",
-                    "policy_enforcement_available": False
-                }
+                agent_info = AgentInfo(
+                    agent_did=agent_did,
+                    developer_did=developer_did,
+                    vc=None,
+                    agent_name=agent_name_with_org,
+                    agent_version=client_version,
+                    capabilities=tuple(capabilities),
+                    identification_method=identification_method,
+                    org_id=org_id,
+                    note=f"Agent exists in Iron Book but fetch failed: {str(fetch_error)}. Policy enforcement disabled until a retry succeeds.",
+                    policy_enforcement_available=False
+                )
                 agent_registry[agent_key] = agent_info
                 
                 return agent_info
         
-        logger.error(f"Failed to register agent: {e}")
+        failure = registration_backoff.failure(flight_key, e)
+        logger.error(f"Failed to register agent: {e} (attempt {failure.attempts})")
         raise
 
@@ -0,0 +1,224 @@
+"""Circuit breaker for Iron Book upstream calls."""
+
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+from .deadline import DeadlineExceededError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAIL_MODES = ("closed", "stale", "local")
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling Iron Book while the circuit is open.
+
+    The error is retryable: the breaker lets a probe through once
+    `retry_after` seconds have passed.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around Iron Book policy evaluation.
+
+    The breaker tracks the outcome of the last `window` upstream calls. Once
+    at least `min_calls` have been seen and the share of failed calls reaches
+    `failure_rate`, or the share of calls slower than `slow_call_seconds`
+    reaches `slow_call_rate`, the circuit opens. While open, calls are
+    rejected immediately with CircuitOpenError instead of waiting for the
+    SDK's timeout. After `open_seconds`, up to `half_open_probes` calls are
+    let through; if they all succeed the circuit closes, and if any fails it
+    opens again.
+
+    When a call fails or is rejected, the policy's fail mode decides the
+    outcome (see enforce_policy):
+
+    - "closed": deny immediately
+    - "stale": serve the last cached decision, even if expired (requires a
+      DecisionCache), else deny
+    - "local": evaluate with the LocalPolicyEvaluator, else deny
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        slow_call_seconds: Optional[float] = None,
+        slow_call_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+        fail_mode: str = "closed",
+        policy_fail_modes: Optional[dict] = None
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            failure_rate: Share of failed calls (0-1) that opens the circuit
+            slow_call_seconds: Latency above which a call counts as slow
+                               (None = latency is not considered)
+            slow_call_rate: Share of slow calls (0-1) that opens the circuit
+            window: Number of recent calls the rates are computed over
+            min_calls: Calls required in the window before the circuit can open
+            open_seconds: Seconds the circuit stays open before probing
+            half_open_probes: Concurrent probe calls allowed when half-open
+            fail_mode: Default fail mode: "closed", "stale" or "local"
+            policy_fail_modes: Optional per-policy fail modes, mapping policy
+                               ID to a fail mode
+        """
+        for mode in [fail_mode, *(policy_fail_modes or {}).values()]:
+            if mode not in FAIL_MODES:
+                raise ValueError(f"Unknown fail mode: {mode}")
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.fail_mode = fail_mode
+        self.policy_fail_modes = policy_fail_modes or {}
+
+        self.state = CLOSED
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejections = 0
+        self.opens = 0
+
+    def fail_mode_for(self, policy_id: str) -> str:
+        """Return the fail mode that applies to a policy."""
+        return self.policy_fail_modes.get(policy_id, self.fail_mode)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run an upstream call through the breaker.
+
+        Args:
+            fn: Zero-argument callable returning the awaitable to run
+
+        Returns:
+            The call's result
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            DeadlineExceededError: If the caller's deadline passed (not
+                                   recorded)
+            Exception: Whatever else the call raised (recorded as a failure)
+        """
+        probe = self._admit()
+        started = time.monotonic()
+        try:
+            result = await fn()
+        except BaseException as e:
+            # Cancellation and the caller running out of budget say nothing
+            # about upstream health
+            if isinstance(e, Exception) and not isinstance(e, DeadlineExceededError):
+                self._record(False, time.monotonic() - started, probe)
+            elif probe:
+                self._probes -= 1
+            raise
+        self._record(True, time.monotonic() - started, probe)
+        return result
+
+    def stats(self) -> dict:
+        """Return the breaker state, window rates and counters."""
+        failure_rate, slow_rate = self._rates()
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "slow_calls": self.slow_calls,
+            "rejections": self.rejections,
+            "opens": self.opens,
+            "window_failure_rate": failure_rate,
+            "window_slow_call_rate": slow_rate,
+        }
+
+    def reset(self) -> None:
+        """Close the circuit and forget recent outcomes."""
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._probes = 0
+
+    def _admit(self) -> bool:
+        """Let a call through or raise CircuitOpenError. Returns True for probes."""
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                self.rejections += 1
+                raise CircuitOpenError(
+                    f"Iron Book circuit open; retrying in {remaining:.1f}s", remaining
+                )
+            self.state = HALF_OPEN
+            self._probes = 0
+            logger.info("Iron Book circuit half-open, probing")
+
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self.rejections += 1
+                raise CircuitOpenError("Iron Book circuit half-open; probe in progress", 0.0)
+            self._probes += 1
+            return True
+        return False
+
+    def _record(self, ok: bool, latency: float, probe: bool) -> None:
+        """Record a call outcome and move between states."""
+        slow = self.slow_call_seconds is not None and latency > self.slow_call_seconds
+        self.calls += 1
+        self.failures += not ok
+        self.slow_calls += slow
+
+        if probe:
+            self._probes -= 1
+            if self.state != HALF_OPEN:
+                return
+            if ok and not slow:
+                if self._probes == 0:
+                    self.reset()
+                    logger.info("Iron Book circuit closed")
+            else:
+                self._open()
+            return
+
+        self._outcomes.append((ok, slow))
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+            failure_rate, slow_rate = self._rates()
+            if failure_rate >= self.failure_rate or (
+                self.slow_call_seconds is not None and slow_rate >= self.slow_call_rate
+            ):
+                self._open()
+
+    def _open(self) -> None:
+        failure_rate, slow_rate = self._rates()
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opens += 1
+        logger.warning(
+            f"Iron Book circuit opened for {self.open_seconds}s "
+            f"(failure rate {failure_rate:.0%}, slow call rate {slow_rate:.0%})"
+        )
+
+    def _rates(self) -> tuple:
+        if not self._outcomes:
+            return 0.0, 0.0
+        total = len(self._outcomes)
+        failures = sum(1 for ok, _ in self._outcomes if not ok)
+        slow = sum(1 for _, slow in self._outcomes if slow)
+        return failures / total, slow / total
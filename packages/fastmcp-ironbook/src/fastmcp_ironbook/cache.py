@@ -0,0 +1,358 @@
+"""Caches for Iron Book upstream lookups."""
+
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from ironbook_sdk import IronBookClient
+
+logger = logging.getLogger(__name__)
+
+
+class _OrgSettingsEntry:
+    """Cached org settings for a single Iron Book client."""
+
+    __slots__ = ("value", "fetched_at", "refresh_task")
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.refresh_task: Optional[asyncio.Task] = None
+
+
+class OrgSettingsCache:
+    """
+    TTL cache for `IronBookClient.get_org_settings()`.
+
+    The org ID almost never changes, so a fetch on every tool call is wasted
+    latency. Entries are served in three windows:
+
+    - Fresh (age < ttl): returned directly, no network.
+    - Stale (ttl <= age < ttl + stale_ttl): returned directly while a single
+      background task refreshes the entry (stale-while-revalidate).
+    - Expired: fetched inline. If the fetch fails and any previous value
+      exists, that value is returned instead (stale-on-error).
+    """
+
+    def __init__(self, ttl: float = 300.0, stale_ttl: float = 3600.0):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Seconds an entry is considered fresh
+            stale_ttl: Extra seconds a stale entry may be served while it is
+                       refreshed in the background
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: dict = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, ironbook_client: IronBookClient) -> Any:
+        """
+        Get org settings for a client, fetching only when required.
+
+        Args:
+            ironbook_client: Iron Book SDK client instance
+
+        Returns:
+            The org settings object returned by the SDK
+
+        Raises:
+            Exception: If the fetch fails and no previous value is cached
+        """
+        key = id(ironbook_client)
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl:
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self._schedule_refresh(ironbook_client, entry)
+                return entry.value
+
+        async with self._lock:
+            # Another caller may have refreshed the entry while we waited
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.fetched_at < self.ttl:
+                return entry.value
+
+            try:
+                return await self._fetch(ironbook_client)
+            except Exception as e:
+                if entry is not None:
+                    logger.warning(f"Failed to refresh org settings: {e}. Serving stale value.")
+                    return entry.value
+                raise
+
+    def invalidate(self, ironbook_client: Optional[IronBookClient] = None) -> None:
+        """
+        Drop cached org settings.
+
+        Args:
+            ironbook_client: Client to invalidate, or None to clear everything
+        """
+        if ironbook_client is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(id(ironbook_client), None)
+
+    async def _fetch(self, ironbook_client: IronBookClient) -> Any:
+        """Fetch org settings and store them in the cache."""
+        value = await ironbook_client.get_org_settings()
+        self._entries[id(ironbook_client)] = _OrgSettingsEntry(value, time.monotonic())
+        return value
+
+    def _schedule_refresh(self, ironbook_client: IronBookClient, entry: _OrgSettingsEntry) -> None:
+        """Start a background refresh for a stale entry unless one is running."""
+        if entry.refresh_task is not None and not entry.refresh_task.done():
+            return
+
+        async def refresh():
+            try:
+                await self._fetch(ironbook_client)
+                logger.debug("Org settings refreshed in background")
+            except Exception as e:
+                logger.warning(f"Background org settings refresh failed: {e}")
+
+        entry.refresh_task = asyncio.create_task(refresh())
+
+
+class CachedDecision:
+    """A policy decision stored in the DecisionCache."""
+
+    __slots__ = ("allow", "reason", "expires_at")
+
+    def __init__(self, allow: bool, reason: Optional[str], expires_at: float):
+        self.allow = allow
+        self.reason = reason
+        self.expires_at = expires_at
+
+
+class DecisionCache:
+    """
+    Bounded LRU cache of Iron Book policy decisions.
+
+    Keys are built by `policy.decision_cache_key()` from the agent DID, policy
+    ID, action, resource and a canonical hash of the decision-relevant context.
+    Allow and deny decisions have separate TTLs, and either can be overridden
+    per policy ID. A TTL of 0 disables caching for that outcome.
+
+    Expired decisions are kept for another `max_stale` seconds (while LRU
+    space allows) so that get_stale() can serve them when Iron Book is
+    unavailable.
+    """
+
+    def __init__(
+        self,
+        allow_ttl: float = 60.0,
+        deny_ttl: float = 10.0,
+        max_size: int = 10000,
+        policy_ttls: Optional[dict] = None,
+        max_stale: float = 300.0
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            allow_ttl: Seconds to cache allow decisions
+            deny_ttl: Seconds to cache deny decisions
+            max_size: Maximum number of cached decisions (LRU eviction)
+            policy_ttls: Optional per-policy overrides, mapping policy ID to
+                         {"allow_ttl": ..., "deny_ttl": ...}
+            max_stale: Seconds past expiry a decision may still be served by
+                       get_stale()
+        """
+        self.allow_ttl = allow_ttl
+        self.deny_ttl = deny_ttl
+        self.max_size = max_size
+        self.policy_ttls = policy_ttls or {}
+        self.max_stale = max_stale
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    def get(self, key: tuple) -> Optional[CachedDecision]:
+        """
+        Look up a cached decision.
+
+        Args:
+            key: Decision cache key
+
+        Returns:
+            The cached decision, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None and entry.expires_at + self.max_stale <= time.monotonic():
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get_stale(self, key: tuple) -> Optional[CachedDecision]:
+        """
+        Look up a decision, accepting one that expired up to max_stale ago.
+
+        Used as a fallback when Iron Book is unavailable.
+
+        Args:
+            key: Decision cache key
+
+        Returns:
+            The cached decision, or None if missing or too old
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at + self.max_stale <= time.monotonic():
+            return None
+        self.stale_hits += 1
+        return entry
+
+    def put(self, key: tuple, policy_id: str, allow: bool, reason: Optional[str] = None) -> None:
+        """
+        Store a decision.
+
+        Args:
+            key: Decision cache key
+            policy_id: Policy the decision belongs to (selects the TTL)
+            allow: Whether the policy allowed the request
+            reason: Deny reason returned by Iron Book
+        """
+        ttl = self.ttl_for(policy_id, allow)
+        if ttl <= 0:
+            return
+
+        self._entries[key] = CachedDecision(allow, reason, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def ttl_for(self, policy_id: str, allow: bool) -> float:
+        """Return the TTL that applies to a decision for a policy."""
+        overrides = self.policy_ttls.get(policy_id, {})
+        if allow:
+            return overrides.get("allow_ttl", self.allow_ttl)
+        return overrides.get("deny_ttl", self.deny_ttl)
+
+    def clear(self) -> None:
+        """Drop all cached decisions."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RegistrationFailure:
+    """A recorded registration failure in the RegistrationBackoff."""
+
+    __slots__ = ("attempts", "error", "retry_at")
+
+    def __init__(self, attempts: int, error: BaseException, retry_at: float):
+        self.attempts = attempts
+        self.error = error
+        self.retry_at = retry_at
+
+
+class RegistrationBackoff:
+    """
+    Negative cache for failed agent registrations.
+
+    After a failure, an agent is not registered again until a backoff delay
+    has passed. The delay grows exponentially with consecutive failures, up
+    to max_delay. Each delay is shortened by a random fraction of up to
+    `jitter`, so agents that failed together do not retry together. A
+    successful registration clears the entry.
+    """
+
+    def __init__(
+        self,
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.5
+    ):
+        """
+        Initialize the backoff.
+
+        Args:
+            base_delay: Seconds to wait after the first failure
+            max_delay: Upper bound on the wait
+            multiplier: Growth factor per consecutive failure
+            jitter: Fraction (0-1) of each delay that is randomized
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self._failures: dict = {}
+
+    def failure(self, key: Any, error: BaseException) -> RegistrationFailure:
+        """
+        Record a failed registration and schedule the next allowed attempt.
+
+        Args:
+            key: Registration key
+            error: The error that caused the failure
+
+        Returns:
+            The updated failure record
+        """
+        previous = self._failures.get(key)
+        attempts = previous.attempts + 1 if previous is not None else 1
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempts - 1))
+        delay *= 1.0 - self.jitter * random.random()
+        entry = RegistrationFailure(attempts, error, time.monotonic() + delay)
+        self._failures[key] = entry
+        return entry
+
+    def success(self, key: Any) -> None:
+        """Clear the failure record for a key."""
+        self._failures.pop(key, None)
+
+    def blocked(self, key: Any) -> Optional[RegistrationFailure]:
+        """
+        Return the failure record if the key is still backing off.
+
+        Args:
+            key: Registration key
+
+        Returns:
+            The failure record, or None if a registration may be attempted
+        """
+        entry = self._failures.get(key)
+        if entry is not None and entry.retry_at > time.monotonic():
+            return entry
+        return None
+
+    def retry_after(self, key: Any) -> float:
+        """Seconds until the next attempt is allowed (0 if not backing off)."""
+        entry = self._failures.get(key)
+        if entry is None:
+            return 0.0
+        return max(entry.retry_at - time.monotonic(), 0.0)
+
+    def clear(self) -> None:
+        """Drop all failure records."""
+        self._failures.clear()
+
+    def __len__(self) -> int:
+        return len(self._failures)
@@ -0,0 +1,50 @@
+"""Concurrency helpers for upstream Iron Book calls."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls that share a key.
+
+    The first caller for a key starts the work as a task; every caller that
+    arrives while it is running awaits the same task and gets the same result
+    or exception. Once the task finishes the key is released, so the next
+    call starts fresh.
+
+    The shared task is shielded, so a cancelled caller does not cancel the
+    work for the others.
+    """
+
+    def __init__(self):
+        self._flights: dict = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn once per key across concurrent callers.
+
+        Args:
+            key: Deduplication key
+            fn: Zero-argument callable returning an awaitable
+
+        Returns:
+            The result of the shared call
+        """
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._release(key, t))
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Return True if a call for key is currently running."""
+        return key in self._flights
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def _release(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
@@ -0,0 +1,120 @@
+"""Latency budgets for policy checks."""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Optional
+from .metrics import observe_stage
+from .tracing import stage_span
+
+
+class DeadlineExceededError(TimeoutError):
+    """
+    Raised when a policy check runs out of its latency budget.
+
+    The error is retryable: it says nothing about whether the agent is
+    allowed, only that Iron Book did not answer in time.
+
+    Attributes:
+        stage: The stage that was cancelled ("org_settings", "registration",
+               "token", "decision" or "local")
+        budget: The total budget of the check, in seconds
+    """
+
+    def __init__(self, message: str, stage: str, budget: float):
+        super().__init__(message)
+        self.stage = stage
+        self.budget = budget
+
+
+class Deadline:
+    """
+    The point in time by which a policy check must finish.
+
+    Created once per check from its latency budget and passed down through
+    each upstream stage, which runs with whatever time remains.
+    """
+
+    __slots__ = ("budget", "expires_at")
+
+    def __init__(self, budget: float):
+        """
+        Start a deadline.
+
+        Args:
+            budget: Seconds from now until the deadline
+        """
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    @classmethod
+    def from_ms(cls, budget_ms: Optional[float]) -> Optional["Deadline"]:
+        """Start a deadline from a budget in milliseconds (None = no deadline)."""
+        if budget_ms is None:
+            return None
+        return cls(budget_ms / 1000.0)
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline (negative once it has passed)."""
+        return self.expires_at - time.monotonic()
+
+    def exceeded(self, stage: str) -> DeadlineExceededError:
+        """Build the error reported when `stage` runs out of budget."""
+        return DeadlineExceededError(
+            f"Policy check exceeded its {self.budget * 1000:.0f}ms latency budget "
+            f"during {stage}",
+            stage,
+            self.budget
+        )
+
+
+async def within(
+    deadline: Optional[Deadline],
+    awaitable: Awaitable[Any],
+    stage: str,
+    record: bool = True
+) -> Any:
+    """
+    Await a stage, cancelling it when the deadline passes.
+
+    Args:
+        deadline: Deadline of the policy check (None = wait indefinitely)
+        awaitable: The stage to run
+        stage: Stage name reported in DeadlineExceededError
+        record: Record the stage's duration in the metrics of the current
+                policy check (False for waits on work that records itself;
+                these are traced as shared stages)
+
+    Returns:
+        The stage's result
+
+    Raises:
+        DeadlineExceededError: If the deadline passes first
+    """
+    with stage_span(stage, shared=not record):
+        if not record:
+            return await _within(deadline, awaitable, stage)
+
+        started = time.perf_counter()
+        try:
+            return await _within(deadline, awaitable, stage)
+        finally:
+            observe_stage(stage, time.perf_counter() - started)
+
+
+async def _within(deadline: Optional[Deadline], awaitable: Awaitable[Any], stage: str) -> Any:
+    if deadline is None:
+        return await awaitable
+
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise deadline.exceeded(stage)
+
+    try:
+        return await asyncio.wait_for(awaitable, remaining)
+    except asyncio.TimeoutError:
+        # A timeout raised by the stage itself is not ours to relabel
+        if deadline.remaining() > 0:
+            raise
+        raise deadline.exceeded(stage) from None
@@ -1,23 +1,29 @@
 """Policy enforcement decorator for FastMCP tools."""
 
 import logging
-import inspect
-from functools import wraps
-from typing import Optional, Callable
+from typing import Iterable, Optional, Callable
 from fastmcp import FastMCP
 from ironbook_sdk import IronBookClient
-from .agent import get_or_register_agent
-from .policy import enforce_policy
+from .breaker import CircuitBreaker
+from .hedging import RequestHedger
+from .limiter import AdaptiveLimiter
+from .cache import DecisionCache, RegistrationBackoff
+from .guard import IronBookGuard
+from .local import LocalPolicyEvaluator
+from .metrics import IronBookMetrics
+from .policy import DecisionBatcher
+from .scheduler import UpstreamScheduler
+from .tokens import TokenPool
 
 logger = logging.getLogger(__name__)
 
-# Module-level state (initialized via setup)
-_mcp_server: Optional[FastMCP] = None
-_ironbook_client: Optional[IronBookClient] = None
-_client_info_cache: Optional[dict] = None
-_agent_registry: Optional[dict] = None
-_developer_did: str = "did:web:identitymachines.com"
-_default_policy_id: Optional[str] = None
+# Default guard behind the module-level setup()/require_policy() API
+_default_guard = IronBookGuard()
+
+
+def get_default_guard() -> IronBookGuard:
+    """Return the guard configured by setup()."""
+    return _default_guard
 
 
 def setup(
@@ -26,20 +32,61 @@ def setup(
     client_info_cache: dict,
     agent_registry: dict,
     developer_did: str = "did:web:identitymachines.com",
-    default_policy_id: Optional[str] = None
+    default_policy_id: Optional[str] = None,
+    org_settings_ttl: float = 300.0,
+    decision_cache: Optional[DecisionCache] = None,
+    token_pool: Optional[TokenPool] = None,
+    coalesce_policy_checks: bool = False,
+    local_evaluator: Optional[LocalPolicyEvaluator] = None,
+    registration_backoff: Optional[RegistrationBackoff] = None,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+    default_latency_budget_ms: Optional[float] = None,
+    hedger: Optional[RequestHedger] = None,
+    scheduler: Optional[UpstreamScheduler] = None,
+    limiter: Optional[AdaptiveLimiter] = None,
+    decision_batcher: Optional[DecisionBatcher] = None,
+    metrics: Optional[IronBookMetrics] = None
 ):
     """
     Initialize the fastmcp-ironbook package with required dependencies.
     
     This must be called once before using the @require_policy decorator.
+    It configures the default IronBookGuard; use IronBookGuard directly to
+    host several secured servers in one process.
     
     Args:
         mcp_server: FastMCP server instance
         ironbook_client: Iron Book SDK client instance
         client_info_cache: Dictionary for caching MCP client info
-        agent_registry: Dictionary for caching agent registrations
+        agent_registry: Dictionary (or AgentRegistry, e.g. SQLiteAgentRegistry)
+                        for caching agent registrations
         developer_did: Developer DID for agent registration
         default_policy_id: Default Iron Book policy ID for all tools
+        org_settings_ttl: Seconds to cache Iron Book org settings before
+                          refreshing them in the background
+        decision_cache: Optional DecisionCache for policy decisions
+                        (disabled when None)
+        token_pool: Optional TokenPool of pre-minted auth tokens
+                    (disabled when None)
+        coalesce_policy_checks: Share one upstream evaluation between
+                                concurrent identical policy checks
+        local_evaluator: Optional LocalPolicyEvaluator for in-process
+                         ("local") or comparison ("shadow") evaluation
+        registration_backoff: Optional RegistrationBackoff tuning retries of
+                              failed agent registrations
+        circuit_breaker: Optional CircuitBreaker around Iron Book policy
+                         evaluation, with per-policy fail modes
+        default_latency_budget_ms: Latency budget for policy checks of tools
+                                   without their own (None = no deadline)
+        hedger: Optional RequestHedger for slow Iron Book decisions
+        scheduler: Optional UpstreamScheduler bounding concurrent Iron Book
+                   calls, fairly shared between agents
+        limiter: Optional AdaptiveLimiter that sheds remote policy evaluations
+                 beyond an adaptive concurrency limit
+        decision_batcher: Optional DecisionBatcher that micro-batches
+                          concurrent policy decision requests
+        metrics: Optional IronBookMetrics recording stage latencies and
+                 decision outcomes
     
     Example:
         from fastmcp import FastMCP
@@ -57,19 +104,38 @@ def setup(
             default_policy_id="policy_abc123"
         )
     """
-    global _mcp_server, _ironbook_client, _client_info_cache, _agent_registry, _developer_did, _default_policy_id
-    
-    _mcp_server = mcp_server
-    _ironbook_client = ironbook_client
-    _client_info_cache = client_info_cache
-    _agent_registry = agent_registry
-    _developer_did = developer_did
-    _default_policy_id = default_policy_id
+    _default_guard.configure(
+        mcp_server=mcp_server,
+        ironbook_client=ironbook_client,
+        client_info_cache=client_info_cache,
+        agent_registry=agent_registry,
+        developer_did=developer_did,
+        default_policy_id=default_policy_id,
+        org_settings_ttl=org_settings_ttl,
+        decision_cache=decision_cache,
+        token_pool=token_pool,
+        coalesce_policy_checks=coalesce_policy_checks,
+        local_evaluator=local_evaluator,
+        registration_backoff=registration_backoff,
+        circuit_breaker=circuit_breaker,
+        default_latency_budget_ms=default_latency_budget_ms,
+        hedger=hedger,
+        scheduler=scheduler,
+        limiter=limiter,
+        decision_batcher=decision_batcher,
+        metrics=metrics
+    )
     
     logger.info("fastmcp-ironbook initialized")
 
 
-def require_policy(context_fn: Optional[Callable] = None, policy_id: Optional[str] = None):
+def require_policy(
+    context_fn: Optional[Callable] = None,
+    policy_id: Optional[str] = None,
+    context_keys: Optional[Iterable[str]] = None,
+    latency_budget_ms: Optional[float] = None,
+    priority: int = 0
+):
     """
     Decorator to automatically enforce Iron Book policy on MCP tools.
     
@@ -81,8 +147,17 @@ def require_policy(context_fn: Optional[Callable] = None, policy_id: Optional[st
     
     Args:
         context_fn: Optional callable that takes the function's arguments and 
-                   returns a context dict for policy evaluation
+                   returns a context dict for policy evaluation. It may take
+                   any subset of the tool's parameters by name.
         policy_id: Optional policy ID to override the default from setup()
+        context_keys: Optional context keys that affect the decision. Only
+                      these keys form the decision cache key, so
+                      high-cardinality context fields do not defeat caching.
+        latency_budget_ms: Optional latency budget for the policy check. When
+                           it runs out, the check fails with the retryable
+                           DeadlineExceededError.
+        priority: Upstream scheduling priority when a scheduler is configured;
+                  give latency-sensitive tools a higher priority
     
     Example:
         # Use default policy ID from setup
@@ -105,55 +180,20 @@ def require_policy(context_fn: Optional[Callable] = None, policy_id: Optional[st
         )
         async def add_numbers(a: float, b: float) -> dict:
             ...
-    """
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            # Check initialization
-            if _mcp_server is None:
-                raise RuntimeError(
-                    "fastmcp-ironbook not initialized. Call fastmcp_ironbook.setup() first."
-                )
-            
-            action = func.__name__
-            resource = f"mcp://{_mcp_server.name}"
-            
-            # Get or register agent
-            agent_info = await get_or_register_agent(
-                ironbook_client=_ironbook_client,
-                client_info_cache=_client_info_cache,
-                agent_registry=_agent_registry,
-                developer_did=_developer_did
-            )
-            
-            # Build context
-            context = {}
-            if context_fn:
-                sig = inspect.signature(func)
-                bound_args = sig.bind(*args, **kwargs)
-                bound_args.apply_defaults()
-                context = context_fn(**bound_args.arguments)
-            
-            # Determine policy ID: decorator override → default → error
-            effective_policy_id = policy_id or _default_policy_id
-            if not effective_policy_id:
-                raise ValueError(
-                    f"No policy ID configured for tool '{func.__name__}'. "
-                    f"Either provide policy_id to @require_policy() or set default_policy_id in setup()."
-                )
-            
-            # Enforce policy
-            await enforce_policy(
-                ironbook_client=_ironbook_client,
-                agent_info=agent_info,
-                action=action,
-                resource=resource,
-                context=context,
-                policy_id=effective_policy_id
-            )
-            
-            return await func(*args, **kwargs)
         
-        return wrapper
-    return decorator
-
+        # Only "operation" is decision-relevant for caching
+        @mcp.tool()
+        @require_policy(
+            lambda a, b: {"operation": "addition", "a": a, "b": b},
+            context_keys=["operation"]
+        )
+        async def add(a: float, b: float) -> float:
+            ...
+    """
+    return _default_guard.require_policy(
+        context_fn=context_fn,
+        policy_id=policy_id,
+        context_keys=context_keys,
+        latency_budget_ms=latency_budget_ms,
+        priority=priority
+    )
\ No newline at end of file
@@ -0,0 +1,625 @@
+"""Per-server Iron Book guard that owns its client, caches and configuration."""
+
+import logging
+import inspect
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import Iterable, Iterator, Optional, Callable
+from fastmcp import FastMCP
+from ironbook_sdk import IronBookClient
+from .agent import AgentInfo, get_or_register_agent
+from .breaker import CircuitBreaker
+from .cache import DecisionCache, OrgSettingsCache, RegistrationBackoff
+from .concurrency import SingleFlight
+from .deadline import Deadline
+from .hedging import RequestHedger
+from .limiter import AdaptiveLimiter
+from .local import LocalPolicyEvaluator
+from .metrics import IronBookMetrics
+from .tracing import request_span, set_attribute, span
+from .policy import DecisionBatcher, enforce_policy
+from .scheduler import UpstreamScheduler
+from .session import DEFAULT_SESSION_KEY
+from .tokens import TokenPool
+
+logger = logging.getLogger(__name__)
+
+# (guard id, action) of the tool call whose policy was already enforced by
+# IronBookPolicyMiddleware, so the decorator does not check it a second time
+_enforced_call: ContextVar[Optional[tuple]] = ContextVar("fastmcp_ironbook_enforced_call", default=None)
+
+
+class ToolPolicy:
+    """
+    Policy configuration for one tool.
+
+    Attributes:
+        policy_id: Policy ID (None = the guard's default)
+        context_fn: Optional callable taking the tool's arguments by name and
+                    returning the policy context
+        context_keys: Context keys that affect the decision (None = all)
+        latency_budget_ms: Latency budget for the policy check (None = the
+                           guard's default)
+        priority: Upstream scheduling priority (higher goes first; use for
+                  latency-sensitive tools)
+    """
+
+    __slots__ = (
+        "policy_id", "context_fn", "context_keys", "latency_budget_ms", "priority",
+        "extract_context_args", "_arg_names"
+    )
+
+    def __init__(
+        self,
+        policy_id: Optional[str] = None,
+        context_fn: Optional[Callable] = None,
+        context_keys: Optional[Iterable[str]] = None,
+        latency_budget_ms: Optional[float] = None,
+        priority: int = 0
+    ):
+        self.policy_id = policy_id
+        self.context_fn = context_fn
+        self.context_keys = tuple(context_keys) if context_keys is not None else None
+        self.latency_budget_ms = latency_budget_ms
+        self.priority = priority
+        self.extract_context_args: Optional[Callable] = None
+        self._arg_names = _named_parameters(context_fn) if context_fn is not None else None
+
+    def build_context(self, arguments: dict) -> dict:
+        """
+        Build the policy context from a tool call's arguments.
+
+        Args:
+            arguments: Tool arguments by name
+
+        Returns:
+            The policy context dict
+        """
+        if self.context_fn is None:
+            return {}
+        if self.extract_context_args is not None:
+            return self.context_fn(**self.extract_context_args((), arguments))
+        if self._arg_names is not None:
+            arguments = {k: v for k, v in arguments.items() if k in self._arg_names}
+        return self.context_fn(**arguments)
+
+
+class IronBookGuard:
+    """
+    Iron Book policy enforcement for one FastMCP server.
+
+    A guard owns everything enforcement needs: the server, the Iron Book
+    client, the client info cache, the agent registry, and the optional
+    caches and pools. Several guards can live in one process (for example,
+    one per tenant server in the same event loop) and may share a single
+    IronBookClient and its connection pool.
+
+    The module-level setup()/require_policy() API is a default guard.
+
+    Example:
+        guard = IronBookGuard(
+            mcp_server=mcp,
+            ironbook_client=ironbook,
+            default_policy_id="policy_abc123"
+        )
+        mcp.add_middleware(ClientInfoMiddleware(guard.client_info_cache))
+
+        @mcp.tool()
+        @guard.require_policy()
+        async def greet(name: str) -> str:
+            return f"Hello, {name}!"
+    """
+
+    def __init__(
+        self,
+        mcp_server: Optional[FastMCP] = None,
+        ironbook_client: Optional[IronBookClient] = None,
+        client_info_cache: Optional[dict] = None,
+        agent_registry: Optional[dict] = None,
+        developer_did: str = "did:web:identitymachines.com",
+        default_policy_id: Optional[str] = None,
+        org_settings_ttl: float = 300.0,
+        decision_cache: Optional[DecisionCache] = None,
+        token_pool: Optional[TokenPool] = None,
+        coalesce_policy_checks: bool = False,
+        local_evaluator: Optional[LocalPolicyEvaluator] = None,
+        org_settings_cache: Optional[OrgSettingsCache] = None,
+        registration_backoff: Optional[RegistrationBackoff] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        default_latency_budget_ms: Optional[float] = None,
+        hedger: Optional[RequestHedger] = None,
+        scheduler: Optional[UpstreamScheduler] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        decision_batcher: Optional[DecisionBatcher] = None,
+        metrics: Optional[IronBookMetrics] = None
+    ):
+        """
+        Create a guard. If mcp_server and ironbook_client are given the guard
+        is ready to use; otherwise call configure() first.
+
+        Args: see configure()
+        """
+        self.registration_flights = SingleFlight()
+        self.tool_policies: dict = {}
+        self.configure(
+            mcp_server=mcp_server,
+            ironbook_client=ironbook_client,
+            client_info_cache=client_info_cache,
+            agent_registry=agent_registry,
+            developer_did=developer_did,
+            default_policy_id=default_policy_id,
+            org_settings_ttl=org_settings_ttl,
+            decision_cache=decision_cache,
+            token_pool=token_pool,
+            coalesce_policy_checks=coalesce_policy_checks,
+            local_evaluator=local_evaluator,
+            org_settings_cache=org_settings_cache,
+            registration_backoff=registration_backoff,
+            circuit_breaker=circuit_breaker,
+            default_latency_budget_ms=default_latency_budget_ms,
+            hedger=hedger,
+            scheduler=scheduler,
+            limiter=limiter,
+            decision_batcher=decision_batcher,
+            metrics=metrics
+        )
+
+    def configure(
+        self,
+        mcp_server: Optional[FastMCP],
+        ironbook_client: Optional[IronBookClient],
+        client_info_cache: Optional[dict] = None,
+        agent_registry: Optional[dict] = None,
+        developer_did: str = "did:web:identitymachines.com",
+        default_policy_id: Optional[str] = None,
+        org_settings_ttl: float = 300.0,
+        decision_cache: Optional[DecisionCache] = None,
+        token_pool: Optional[TokenPool] = None,
+        coalesce_policy_checks: bool = False,
+        local_evaluator: Optional[LocalPolicyEvaluator] = None,
+        org_settings_cache: Optional[OrgSettingsCache] = None,
+        registration_backoff: Optional[RegistrationBackoff] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        default_latency_budget_ms: Optional[float] = None,
+        hedger: Optional[RequestHedger] = None,
+        scheduler: Optional[UpstreamScheduler] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        decision_batcher: Optional[DecisionBatcher] = None,
+        metrics: Optional[IronBookMetrics] = None
+    ) -> "IronBookGuard":
+        """
+        Configure (or reconfigure) the guard.
+
+        Args:
+            mcp_server: FastMCP server instance
+            ironbook_client: Iron Book SDK client instance (may be shared)
+            client_info_cache: Dictionary for caching MCP client info
+                               (a new one is created if omitted)
+            agent_registry: Dictionary (or AgentRegistry) for caching agent
+                            registrations (a new one is created if omitted)
+            developer_did: Developer DID for agent registration
+            default_policy_id: Default Iron Book policy ID for all tools
+            org_settings_ttl: Seconds to cache Iron Book org settings before
+                              refreshing them in the background
+            decision_cache: Optional DecisionCache for policy decisions
+            token_pool: Optional TokenPool of pre-minted auth tokens
+            coalesce_policy_checks: Share one upstream evaluation between
+                                    concurrent identical policy checks
+            local_evaluator: Optional LocalPolicyEvaluator for in-process
+                             ("local") or comparison ("shadow") evaluation
+            org_settings_cache: Optional OrgSettingsCache to share between
+                                guards that use the same Iron Book client
+                                (overrides org_settings_ttl)
+            registration_backoff: Optional RegistrationBackoff tuning retries
+                                  of failed registrations (a default one is
+                                  created if omitted)
+            circuit_breaker: Optional CircuitBreaker around Iron Book policy
+                             evaluation, with per-policy fail modes
+            default_latency_budget_ms: Latency budget for policy checks of
+                                       tools without their own (None = no
+                                       deadline)
+            hedger: Optional RequestHedger for slow Iron Book decisions
+            scheduler: Optional UpstreamScheduler bounding concurrent Iron
+                       Book calls, fairly shared between agents (may be
+                       shared between guards that use the same client)
+            limiter: Optional AdaptiveLimiter that sheds remote policy
+                     evaluations beyond an adaptive concurrency limit
+            decision_batcher: Optional DecisionBatcher that micro-batches
+                              concurrent policy decision requests
+            metrics: Optional IronBookMetrics recording stage latencies and
+                     decision outcomes
+
+        Returns:
+            The guard itself
+        """
+        self.mcp_server = mcp_server
+        self.ironbook_client = ironbook_client
+        self.client_info_cache = client_info_cache if client_info_cache is not None else {}
+        self.agent_registry = agent_registry if agent_registry is not None else {}
+        self.developer_did = developer_did
+        self.default_policy_id = default_policy_id
+        if org_settings_cache is None:
+            org_settings_cache = OrgSettingsCache(ttl=org_settings_ttl)
+        self.org_settings_cache = org_settings_cache
+        if registration_backoff is None:
+            registration_backoff = RegistrationBackoff()
+        self.registration_backoff = registration_backoff
+        self.decision_cache = decision_cache
+        self.token_pool = token_pool
+        self.policy_check_flights = SingleFlight() if coalesce_policy_checks else None
+        self.local_evaluator = local_evaluator
+        self.circuit_breaker = circuit_breaker
+        self.default_latency_budget_ms = default_latency_budget_ms
+        self.hedger = hedger
+        self.scheduler = scheduler
+        self.limiter = limiter
+        self.decision_batcher = decision_batcher
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.watch(circuit_breaker=circuit_breaker, scheduler=scheduler, token_pool=token_pool)
+        self.resource = f"mcp://{mcp_server.name}" if mcp_server is not None else None
+
+        if self.configured:
+            logger.info(f"Iron Book guard configured for {self.resource}")
+        return self
+
+    @property
+    def configured(self) -> bool:
+        """True once the guard has a server and client."""
+        return self.mcp_server is not None and self.ironbook_client is not None
+
+    @contextmanager
+    def enforced_call(self, action: str) -> Iterator[None]:
+        """
+        Mark the current tool call as already enforced for this guard.
+
+        Used by IronBookPolicyMiddleware so that a decorated tool does not
+        run the same policy check again inside the call.
+
+        Args:
+            action: The tool name that was checked
+        """
+        token = _enforced_call.set((id(self), action))
+        try:
+            yield
+        finally:
+            _enforced_call.reset(token)
+
+    async def get_agent(
+        self,
+        session_id: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        priority: int = 0
+    ) -> AgentInfo:
+        """
+        Get or register the agent for a session using this guard's state.
+
+        Args:
+            session_id: MCP session ID (defaults to the current request's)
+            deadline: Optional deadline for org settings and registration
+            priority: Upstream scheduling priority of the registration
+
+        Returns:
+            AgentInfo for the session's agent
+        """
+        return await get_or_register_agent(
+            ironbook_client=self.ironbook_client,
+            client_info_cache=self.client_info_cache,
+            agent_registry=self.agent_registry,
+            developer_did=self.developer_did,
+            org_settings_cache=self.org_settings_cache,
+            registration_flights=self.registration_flights,
+            session_id=session_id,
+            registration_backoff=self.registration_backoff,
+            deadline=deadline,
+            scheduler=self.scheduler,
+            priority=priority
+        )
+
+    async def warm(
+        self,
+        session_id: Optional[str] = None,
+        client_info: Optional[dict] = None
+    ) -> Optional[AgentInfo]:
+        """
+        Register the agent for a session ahead of its first tool call.
+
+        Registration goes through the guard's single-flight group, so a tool
+        call that arrives while warming is in progress awaits the same
+        registration instead of starting another. If a token pool is
+        configured, it is also filled for every tool decorated with this
+        guard's require_policy(). Errors are logged, not raised; the first
+        tool call retries as usual.
+
+        Args:
+            session_id: MCP session ID (defaults to the current request's)
+            client_info: Client info to register the agent of instead of a
+                         session's, as captured at initialize (before the
+                         session is available)
+
+        Returns:
+            AgentInfo, or None if registration failed
+        """
+        if not self.configured:
+            return None
+
+        try:
+            if client_info is not None:
+                # Registrations are keyed by agent, not session, so this one
+                # is shared with the session's first tool call
+                agent_info = await get_or_register_agent(
+                    ironbook_client=self.ironbook_client,
+                    client_info_cache={DEFAULT_SESSION_KEY: client_info},
+                    agent_registry=self.agent_registry,
+                    developer_did=self.developer_did,
+                    org_settings_cache=self.org_settings_cache,
+                    registration_flights=self.registration_flights,
+                    session_id=DEFAULT_SESSION_KEY,
+                    registration_backoff=self.registration_backoff,
+                    scheduler=self.scheduler
+                )
+            else:
+                agent_info = await self.get_agent(session_id)
+        except Exception as e:
+            logger.warning(f"Background agent registration failed: {e}")
+            return None
+
+        if self.token_pool is not None and agent_info.vc:
+            for action in self.tool_policies:
+                await self.token_pool.warm(
+                    self.ironbook_client, agent_info, action, self.resource, self.scheduler
+                )
+
+        return agent_info
+
+    async def enforce(
+        self,
+        action: str,
+        context: Optional[dict] = None,
+        policy_id: Optional[str] = None,
+        context_keys: Optional[Iterable[str]] = None,
+        agent_info: Optional[AgentInfo] = None,
+        latency_budget_ms: Optional[float] = None,
+        priority: int = 0,
+        prefetch: bool = False
+    ) -> bool:
+        """
+        Enforce policy for an action on this guard's server.
+
+        Args:
+            action: The action being performed (usually the tool name)
+            context: Optional context for policy evaluation
+            policy_id: Policy ID overriding the guard's default
+            context_keys: Context keys that affect the decision
+            agent_info: Agent info to check (defaults to the current session's)
+            latency_budget_ms: Budget for the whole check, including agent
+                               registration (defaults to the guard's)
+            priority: Upstream scheduling priority (higher goes first)
+            prefetch: The check filters tools/list rather than guarding a
+                      call; it is counted in the prefetch metric only
+
+        Returns:
+            True if allowed
+
+        Raises:
+            RuntimeError: If the guard is not configured
+            ValueError: If no policy ID is configured
+            PermissionError: If policy denies access
+            DeadlineExceededError: If the check runs out of budget
+            LoadShedError: If the limiter sheds the check
+        """
+        if not self.configured:
+            raise RuntimeError(
+                "fastmcp-ironbook not initialized. Call fastmcp_ironbook.setup() first."
+            )
+
+        # Determine policy ID: decorator override → default → error
+        effective_policy_id = policy_id or self.default_policy_id
+        if not effective_policy_id:
+            raise ValueError(
+                f"No policy ID configured for tool '{action}'. "
+                f"Either provide policy_id to @require_policy() or set default_policy_id in setup()."
+            )
+
+        if latency_budget_ms is None:
+            latency_budget_ms = self.default_latency_budget_ms
+        deadline = Deadline.from_ms(latency_budget_ms)
+
+        started = time.perf_counter()
+        outcome = "error"
+        metrics_check = nullcontext()
+        if self.metrics is not None and not prefetch:
+            metrics_check = self.metrics.check(action, effective_policy_id)
+        enforce_span = span("ironbook.enforce", {
+            "ironbook.action": action,
+            "ironbook.resource": self.resource,
+            "ironbook.policy_id": effective_policy_id,
+        })
+        with metrics_check, enforce_span:
+            try:
+                if agent_info is None:
+                    agent_info = await self.get_agent(deadline=deadline, priority=priority)
+
+                allowed = await enforce_policy(
+                    ironbook_client=self.ironbook_client,
+                    agent_info=agent_info,
+                    action=action,
+                    resource=self.resource,
+                    context=context,
+                    policy_id=effective_policy_id,
+                    decision_cache=self.decision_cache,
+                    context_keys=context_keys,
+                    token_pool=self.token_pool,
+                    coalescer=self.policy_check_flights,
+                    local_evaluator=self.local_evaluator,
+                    circuit_breaker=self.circuit_breaker,
+                    deadline=deadline,
+                    hedger=self.hedger,
+                    scheduler=self.scheduler,
+                    priority=priority,
+                    limiter=self.limiter,
+                    batcher=self.decision_batcher
+                )
+                outcome = "allow"
+                return allowed
+            except PermissionError:
+                outcome = "deny"
+                raise
+            finally:
+                set_attribute("ironbook.decision", outcome)
+                if self.metrics is not None and prefetch:
+                    self.metrics.observe_prefetch(action, effective_policy_id, outcome)
+                elif self.metrics is not None:
+                    self.metrics.observe_check(
+                        action, effective_policy_id, outcome, time.perf_counter() - started,
+                        agent_info.agent_did if agent_info is not None else None
+                    )
+
+    def require_policy(
+        self,
+        context_fn: Optional[Callable] = None,
+        policy_id: Optional[str] = None,
+        context_keys: Optional[Iterable[str]] = None,
+        latency_budget_ms: Optional[float] = None,
+        priority: int = 0
+    ):
+        """
+        Decorator to enforce this guard's Iron Book policy on an MCP tool.
+
+        Automatically sets:
+        - action: The name of the decorated function
+        - resource: mcp://{server_name}
+
+        Args:
+            context_fn: Optional callable that takes the function's arguments and
+                       returns a context dict for policy evaluation. It may take
+                       any subset of the tool's parameters by name.
+            policy_id: Optional policy ID to override the guard's default
+            context_keys: Optional context keys that affect the decision. Only
+                          these keys form the decision cache key, so
+                          high-cardinality context fields do not defeat caching.
+            latency_budget_ms: Optional latency budget for the policy check,
+                               overriding the guard's default
+            priority: Upstream scheduling priority; give latency-sensitive
+                      tools a higher priority than batch-style ones
+        """
+        if context_keys is not None:
+            context_keys = tuple(context_keys)
+
+        def decorator(func):
+            # Resolved once per tool rather than on every call
+            action = func.__name__
+            extract_context_args = _compile_context_args(func, context_fn) if context_fn else None
+
+            tool_policy = ToolPolicy(
+                policy_id, context_fn, context_keys, latency_budget_ms, priority
+            )
+            tool_policy.extract_context_args = extract_context_args
+            self.tool_policies[action] = tool_policy
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                # Already checked by IronBookPolicyMiddleware for this call
+                if _enforced_call.get() == (id(self), action):
+                    return await func(*args, **kwargs)
+
+                with request_span(f"tools/call {action}", {"ironbook.action": action}):
+                    # Build context
+                    context = {}
+                    if extract_context_args:
+                        with span("ironbook.context"):
+                            started = time.perf_counter()
+                            context = context_fn(**extract_context_args(args, kwargs))
+                            if self.metrics is not None:
+                                self.metrics.observe_stage("context", time.perf_counter() - started)
+
+                    await self.enforce(
+                        action=action,
+                        context=context,
+                        policy_id=policy_id,
+                        context_keys=context_keys,
+                        latency_budget_ms=latency_budget_ms,
+                        priority=priority
+                    )
+
+                    with span("ironbook.tool"):
+                        return await func(*args, **kwargs)
+
+            return wrapper
+        return decorator
+
+
+def _named_parameters(fn: Callable) -> Optional[frozenset]:
+    """Return fn's parameter names, or None if it accepts **kwargs."""
+    try:
+        params = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params):
+        return None
+    return frozenset(p.name for p in params)
+
+
+def _compile_context_args(func: Callable, context_fn: Callable) -> Callable:
+    """
+    Build an argument-extraction plan for context_fn, once per tool.
+
+    When context_fn takes named parameters that all exist on the tool, the
+    returned extractor picks just those values out of the call's args/kwargs
+    (falling back to the tool's defaults) without binding the full signature.
+    Otherwise it binds the full signature and passes every argument, which
+    is the general behaviour.
+
+    Args:
+        func: The decorated tool function
+        context_fn: The context callable passed to @require_policy
+
+    Returns:
+        Callable taking (args, kwargs) and returning context_fn's kwargs
+    """
+    sig = inspect.signature(func)
+
+    def bind_all(args: tuple, kwargs: dict) -> dict:
+        bound_args = sig.bind(*args, **kwargs)
+        bound_args.apply_defaults()
+        return bound_args.arguments
+
+    named = (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+    try:
+        context_params = inspect.signature(context_fn).parameters.values()
+    except (TypeError, ValueError):
+        return bind_all
+    if any(p.kind not in named for p in sig.parameters.values()):
+        return bind_all
+
+    positions = {name: index for index, name in enumerate(sig.parameters)}
+    plan = []
+    for param in context_params:
+        if param.kind not in named:
+            return bind_all
+        tool_param = sig.parameters.get(param.name)
+        if tool_param is None:
+            if param.default is inspect.Parameter.empty:
+                return bind_all
+            continue  # context_fn supplies its own default
+        index = positions[param.name] if tool_param.kind is inspect.Parameter.POSITIONAL_OR_KEYWORD else None
+        plan.append((param.name, index, tool_param.default))
+    plan = tuple(plan)
+
+    def extract(args: tuple, kwargs: dict) -> dict:
+        values = {}
+        for name, index, default in plan:
+            if name in kwargs:
+                values[name] = kwargs[name]
+            elif index is not None and index < len(args):
+                values[name] = args[index]
+            elif default is not inspect.Parameter.empty:
+                values[name] = default
+            else:
+                # Missing required argument: bind() raises the usual TypeError
+                bind_all(args, kwargs)
+        return values
+
+    return extract
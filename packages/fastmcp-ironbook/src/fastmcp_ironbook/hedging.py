@@ -0,0 +1,136 @@
+"""Hedged Iron Book requests for tail latency."""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RequestHedger:
+    """
+    Hedge slow upstream requests with a second attempt.
+
+    If a request has not completed after the `percentile` latency of recent
+    requests, a second, independent attempt is started (with its own fresh
+    token) and whichever finishes first wins; the other is cancelled. Hedges
+    are capped at `budget` times the number of requests (0.05 = at most 5%
+    extra load), and no hedging happens until `min_samples` latencies have
+    been observed.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        budget: float = 0.05,
+        min_samples: int = 20,
+        window: int = 200,
+        min_delay: float = 0.005
+    ):
+        """
+        Initialize the hedger.
+
+        Args:
+            percentile: Latency percentile (0-100) after which a hedge fires
+            budget: Maximum hedges as a fraction of requests
+            min_samples: Latencies required before hedging starts
+            window: Number of recent latencies the percentile is computed over
+            min_delay: Lower bound on the hedge delay, in seconds
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies: deque = deque(maxlen=window)
+        self._delay: Optional[float] = None
+        self._stale_samples = 0
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a request is hedged, or None while warming up."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        # Recompute the percentile every few samples rather than per request
+        if self._delay is None or self._stale_samples >= 10:
+            ordered = sorted(self._latencies)
+            index = min(len(ordered) - 1, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+            self._delay = max(ordered[max(index, 0)], self.min_delay)
+            self._stale_samples = 0
+        return self._delay
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a request, hedging it if it is slow and the budget allows.
+
+        Args:
+            fn: Zero-argument callable starting one independent attempt
+
+        Returns:
+            The result of the first attempt to succeed
+
+        Raises:
+            Exception: The error of the last attempt if all attempts fail
+        """
+        self.requests += 1
+        delay = self.hedge_delay()
+        started = time.monotonic()
+        primary = asyncio.ensure_future(fn())
+
+        if delay is None:
+            result = await primary
+            self._record(time.monotonic() - started)
+            return result
+
+        attempts = {primary}
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if done:
+                result = primary.result()
+                self._record(time.monotonic() - started)
+                return result
+
+            if self.hedges >= self.budget * self.requests:
+                result = await primary
+                self._record(time.monotonic() - started)
+                return result
+
+            self.hedges += 1
+            hedge_started = time.monotonic()
+            hedge = asyncio.ensure_future(fn())
+            attempts.add(hedge)
+            logger.debug(f"Hedging upstream request after {delay * 1000:.0f}ms")
+
+            while True:
+                done, _ = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    attempts.discard(task)
+                    if task.exception() is None or not attempts:
+                        if task is hedge and task.exception() is None:
+                            self.hedge_wins += 1
+                            self._record(time.monotonic() - hedge_started)
+                        elif task.exception() is None:
+                            self._record(time.monotonic() - started)
+                        return task.result()
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    def stats(self) -> dict:
+        """Return request, hedge and win counters, rates and the current delay."""
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "win_rate": self.hedge_wins / self.hedges if self.hedges else 0.0,
+            "hedge_delay": self._delay,
+        }
+
+    def _record(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self._stale_samples += 1
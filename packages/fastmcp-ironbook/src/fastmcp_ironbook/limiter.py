@@ -0,0 +1,151 @@
+"""Adaptive concurrency limit for Iron Book upstream calls."""
+
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+from .breaker import CircuitOpenError
+from .deadline import DeadlineExceededError
+
+logger = logging.getLogger(__name__)
+
+
+class LoadShedError(RuntimeError):
+    """
+    Raised instead of calling Iron Book when the concurrency limit is reached.
+
+    The error is retryable: it says nothing about whether the agent is
+    allowed, only that the server is shedding load. `retry_after` is a
+    suggested delay in seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit in front of remote policy evaluation.
+
+    Each remote evaluation (token minting and the policy decision) holds one
+    permit. While calls succeed at close to the baseline latency (the
+    fastest of the last `window` calls), the limit grows additively by about
+    one per round trip. When a call fails, or takes longer than
+    `latency_tolerance` times the baseline, the limit is multiplied by
+    `backoff_ratio`, at most once per round trip. Calls beyond the limit are
+    rejected immediately with LoadShedError instead of queueing behind a
+    slow upstream.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        backoff_ratio: float = 0.9,
+        latency_tolerance: float = 2.0,
+        window: int = 100
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_limit: Starting concurrency limit
+            min_limit: Lowest the limit can go
+            max_limit: Highest the limit can go
+            backoff_ratio: Factor (0-1) the limit is multiplied by on a drop
+            latency_tolerance: Multiple of the baseline latency above which a
+                               call counts as a drop
+            window: Number of recent latencies the baseline is taken from
+        """
+        if not 0 < backoff_ratio < 1:
+            raise ValueError("backoff_ratio must be between 0 and 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._latencies: deque = deque(maxlen=window)
+        self._last_drop = 0.0
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.drops = 0
+
+    @property
+    def limit(self) -> int:
+        """Current concurrency limit."""
+        return int(self._limit)
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run an upstream call if the limit allows.
+
+        Args:
+            fn: Zero-argument callable returning the awaitable to run
+
+        Returns:
+            The call's result
+
+        Raises:
+            LoadShedError: If the concurrency limit is reached
+            Exception: Whatever the call raised (counted as a drop)
+        """
+        if self.in_flight >= self.limit:
+            self.shed += 1
+            raise LoadShedError(
+                f"Iron Book concurrency limit ({self.limit}) reached; retry shortly",
+                self._baseline() or 0.1
+            )
+
+        self.in_flight += 1
+        self.admitted += 1
+        saturated = self.in_flight * 2 >= self.limit
+        started = time.monotonic()
+        try:
+            result = await fn()
+        except (CircuitOpenError, DeadlineExceededError):
+            # Rejected without reaching Iron Book, or cut short by the
+            # caller's budget; nothing was learned
+            raise
+        except Exception:
+            self._drop(started)
+            raise
+        finally:
+            self.in_flight -= 1
+
+        latency = time.monotonic() - started
+        baseline = self._baseline()
+        self._latencies.append(latency)
+        if baseline is not None and latency > baseline * self.latency_tolerance:
+            self._drop(started)
+        elif saturated:
+            # Only grow while the limit is actually being used
+            self._limit = min(self._limit + 1.0 / self._limit, float(self.max_limit))
+        return result
+
+    def stats(self) -> dict:
+        """Return the current limit, in-flight count, counters and baseline latency."""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "drops": self.drops,
+            "baseline_latency": self._baseline(),
+        }
+
+    def _baseline(self) -> Optional[float]:
+        return min(self._latencies) if self._latencies else None
+
+    def _drop(self, started: float) -> None:
+        """Back off multiplicatively, once per round trip."""
+        if started < self._last_drop:
+            return
+        self._last_drop = time.monotonic()
+        self.drops += 1
+        previous = self.limit
+        self._limit = max(self._limit * self.backoff_ratio, float(self.min_limit))
+        if self.limit != previous:
+            logger.info(f"Iron Book concurrency limit lowered to {self.limit}")
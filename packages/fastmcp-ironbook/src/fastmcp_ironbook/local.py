@@ -0,0 +1,967 @@
+"""Local (in-process) evaluation of Iron Book Rego policies."""
+
+import os
+import re
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Mapping, Optional, Tuple
+from ironbook_sdk import IronBookClient
+
+logger = logging.getLogger(__name__)
+
+
+class RegoError(ValueError):
+    """Raised when a policy uses Rego the local engine does not support."""
+
+
+class _Undefined:
+    """Rego's undefined value (missing keys, failed lookups)."""
+
+    def __repr__(self) -> str:
+        return "undefined"
+
+
+UNDEFINED = _Undefined()
+
+
+# === Tokenizer ===
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>[ \t\r]+)
+  | (?P<comment>\#[^\n]*)
+  | (?P<nl>\n)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<raw>`[^`]*`)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>:=|==|!=|<=|>=|[-<>=(){}\[\],;.:])
+""", re.VERBOSE)
+
+_KEYWORDS = {"package", "import", "default", "if", "not", "some", "in", "true", "false", "null"}
+_COMPARISONS = {"==", "!=", "<", "<=", ">", ">=", "="}
+
+
+def _tokenize(source: str) -> list:
+    tokens = []
+    pos = 0
+    line = 1
+    while pos < len(source):
+        match = _TOKEN_RE.match(source, pos)
+        if match is None:
+            raise RegoError(f"Unexpected character {source[pos]!r} on line {line}")
+        kind = match.lastgroup
+        text = match.group()
+        pos = match.end()
+        if kind == "nl":
+            tokens.append(("nl", text, line))
+            line += 1
+        elif kind == "string":
+            tokens.append(("value", _unescape(text[1:-1]), line))
+        elif kind == "raw":
+            tokens.append(("value", text[1:-1], line))
+            line += text.count("\n")
+        elif kind == "number":
+            tokens.append(("value", float(text) if "." in text else int(text), line))
+        elif kind in ("name", "op"):
+            tokens.append((kind, text, line))
+    tokens.append(("eof", None, line))
+    return tokens
+
+
+def _unescape(text: str) -> str:
+    return re.sub(r'\\(.)', lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)), text)
+
+
+# === AST ===
+
+class _Const:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class _Var:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+
+class _Ref:
+    __slots__ = ("base", "path")
+
+    def __init__(self, base, path):
+        self.base = base
+        self.path = path
+
+
+class _Call:
+    __slots__ = ("name", "args")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+
+class _Array:
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+
+class _Object:
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+
+class _Rule:
+    __slots__ = ("name", "value", "body")
+
+    def __init__(self, name, value, body):
+        self.name = name
+        self.value = value
+        self.body = body
+
+
+def _starts_with(s, prefix):
+    return isinstance(s, str) and isinstance(prefix, str) and s.startswith(prefix)
+
+
+def _ends_with(s, suffix):
+    return isinstance(s, str) and isinstance(suffix, str) and s.endswith(suffix)
+
+
+def _contains(s, sub):
+    return isinstance(s, str) and isinstance(sub, str) and sub in s
+
+
+def _substring(s, start, length):
+    if not isinstance(s, str):
+        return UNDEFINED
+    return s[start:] if length < 0 else s[start:start + length]
+
+
+_BUILTINS = {
+    "startswith": _starts_with,
+    "endswith": _ends_with,
+    "contains": _contains,
+    "count": lambda coll: len(coll) if isinstance(coll, (str, list, dict)) else UNDEFINED,
+    "lower": lambda s: s.lower() if isinstance(s, str) else UNDEFINED,
+    "upper": lambda s: s.upper() if isinstance(s, str) else UNDEFINED,
+    "concat": lambda sep, items: sep.join(items),
+    "substring": _substring,
+    "object.get": lambda obj, key, default: obj.get(key, default) if isinstance(obj, dict) else default,
+}
+
+
+# === Parser ===
+
+class _Parser:
+    def __init__(self, source: str):
+        self.tokens = _tokenize(source)
+        self.pos = 0
+
+    def peek(self, offset: int = 0):
+        return self.tokens[self.pos + offset]
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def accept(self, text: str) -> bool:
+        kind, value, _ = self.peek()
+        if kind in ("name", "op") and value == text:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, text: str) -> None:
+        if not self.accept(text):
+            kind, value, line = self.peek()
+            raise RegoError(f"Expected {text!r} on line {line}, got {value!r}")
+
+    def skip_newlines(self) -> None:
+        while self.peek()[0] == "nl":
+            self.pos += 1
+
+    def skip_line(self) -> None:
+        while self.peek()[0] not in ("nl", "eof"):
+            self.pos += 1
+
+    def parse_module(self) -> Tuple[dict, dict]:
+        defaults = {}
+        rules = {}
+        while True:
+            self.skip_newlines()
+            kind, value, line = self.peek()
+            if kind == "eof":
+                return defaults, rules
+            if kind != "name":
+                raise RegoError(f"Unexpected {value!r} on line {line}")
+
+            if value in ("package", "import"):
+                self.skip_line()
+            elif value == "default":
+                self.next()
+                name = self.next()[1]
+                if not (self.accept("=") or self.accept(":=")):
+                    raise RegoError(f"Expected '=' after default {name} on line {line}")
+                defaults[name] = self.parse_term()
+            else:
+                rule = self.parse_rule()
+                rules.setdefault(rule.name, []).append(rule)
+
+    def parse_rule(self) -> _Rule:
+        kind, name, line = self.next()
+        if name in _KEYWORDS:
+            raise RegoError(f"Unexpected keyword {name!r} on line {line}")
+
+        value = None
+        if self.accept("=") or self.accept(":="):
+            value = self.parse_term()
+
+        if self.accept("if"):
+            if self.peek()[1] == "{":
+                body = self.parse_body()
+            else:
+                body = [self.parse_expr()]
+        elif self.peek()[1] == "{":
+            body = self.parse_body()
+        elif value is not None:
+            body = []
+        else:
+            raise RegoError(f"Unsupported rule syntax for {name!r} on line {line}")
+
+        if self.peek()[0] not in ("nl", "eof"):
+            raise RegoError(f"Unsupported syntax after rule {name!r} on line {line}")
+        return _Rule(name, value, body)
+
+    def parse_body(self) -> list:
+        self.expect("{")
+        exprs = []
+        while True:
+            while self.peek()[0] == "nl" or self.peek()[1] == ";":
+                self.pos += 1
+            if self.accept("}"):
+                return exprs
+            exprs.append(self.parse_expr())
+
+    def parse_expr(self) -> tuple:
+        if self.accept("not"):
+            return ("not", self.parse_expr())
+
+        if self.accept("some"):
+            names = [self.next()[1]]
+            while self.accept(","):
+                names.append(self.next()[1])
+            if not self.accept("in") or len(names) > 2:
+                raise RegoError(f"Only 'some x in coll' is supported (line {self.peek()[2]})")
+            return ("some", names, self.parse_term())
+
+        left = self.parse_term()
+        kind, op, line = self.peek()
+        if op == ":=":
+            self.next()
+            if not isinstance(left, _Var):
+                raise RegoError(f"Can only assign to a variable on line {line}")
+            return ("assign", left.name, self.parse_term())
+        if kind == "op" and op in _COMPARISONS:
+            self.next()
+            return ("compare", "==" if op == "=" else op, left, self.parse_term())
+        if self.accept("in"):
+            return ("in", left, self.parse_term())
+        return ("term", left)
+
+    def parse_term(self):
+        kind, value, line = self.next()
+
+        if kind == "value":
+            term = _Const(value)
+        elif kind == "op" and value == "-" and self.peek()[0] == "value":
+            term = _Const(-self.next()[1])
+        elif kind == "op" and value == "[":
+            term = _Array(self.parse_items("]"))
+        elif kind == "op" and value == "{":
+            term = self.parse_braces()
+        elif kind == "op" and value == "(":
+            self.skip_newlines()
+            term = self.parse_term()
+            self.skip_newlines()
+            self.expect(")")
+        elif kind == "name" and value in ("true", "false", "null"):
+            term = _Const({"true": True, "false": False, "null": None}[value])
+        elif kind == "name" and value not in _KEYWORDS:
+            term = self.parse_name(value, line)
+        else:
+            raise RegoError(f"Unexpected {value!r} on line {line}")
+
+        # Postfix references: .field and [index]
+        path = []
+        while True:
+            if self.peek()[1] == "." and self.peek(1)[0] == "name":
+                self.next()
+                path.append(_Const(self.next()[1]))
+            elif self.peek()[1] == "[":
+                self.next()
+                self.skip_newlines()
+                path.append(self.parse_term())
+                self.skip_newlines()
+                self.expect("]")
+            else:
+                break
+        return _Ref(term, path) if path else term
+
+    def parse_name(self, name: str, line: int):
+        # Dotted builtin names such as object.get
+        if self.peek()[1] == "." and self.peek(2)[1] == "(":
+            name = f"{name}.{self.peek(1)[1]}"
+            self.pos += 2
+
+        if self.peek()[1] == "(":
+            if name not in _BUILTINS:
+                raise RegoError(f"Unsupported builtin {name!r} on line {line}")
+            self.next()
+            return _Call(name, self.parse_items(")"))
+        return _Var(name)
+
+    def parse_items(self, closing: str) -> list:
+        items = []
+        while True:
+            self.skip_newlines()
+            if self.accept(closing):
+                return items
+            items.append(self.parse_term())
+            self.skip_newlines()
+            if not self.accept(","):
+                self.skip_newlines()
+                self.expect(closing)
+                return items
+
+    def parse_braces(self):
+        """Parse a set ({a, b}) or object ({"k": v}) literal after '{'."""
+        items = []
+        is_object = None
+        while True:
+            self.skip_newlines()
+            if self.accept("}"):
+                break
+            key = self.parse_term()
+            if self.accept(":"):
+                if is_object is False:
+                    raise RegoError("Mixed set/object literal")
+                is_object = True
+                items.append((key, self.parse_term()))
+            else:
+                if is_object:
+                    raise RegoError("Mixed set/object literal")
+                is_object = False
+                items.append(key)
+            self.skip_newlines()
+            if not self.accept(","):
+                self.skip_newlines()
+                self.expect("}")
+                break
+        return _Object(items) if is_object else _Array(items)
+
+
+# === Binding checks ===
+
+def _check_bindings(defaults: dict, rules: dict) -> None:
+    """
+    Reject variables that are used without being bound.
+
+    The evaluator has no unification or iteration over references, so an
+    unbound variable (including `_`, as in `roles[_]`) would silently
+    evaluate to undefined and flip deny rules to allow.
+    """
+    known = {"input"} | set(rules) | set(defaults)
+    for name, term in defaults.items():
+        _check_term(term, known, name)
+    for name, bodies in rules.items():
+        for rule in bodies:
+            bound = set(known)
+            for expr in rule.body:
+                _check_expr(expr, bound, name)
+            if rule.value is not None:
+                _check_term(rule.value, bound, name)
+
+
+def _check_expr(expr: tuple, bound: set, rule: str) -> None:
+    """Check an expression and add the variables it binds to `bound`."""
+    op = expr[0]
+    if op == "not":
+        # Bindings inside a negation do not escape it
+        _check_expr(expr[1], set(bound), rule)
+    elif op == "some":
+        _check_term(expr[2], bound, rule)
+        bound.update(expr[1])
+    elif op == "assign":
+        _check_term(expr[2], bound, rule)
+        bound.add(expr[1])
+    else:
+        for term in expr[1:]:
+            if not isinstance(term, str):
+                _check_term(term, bound, rule)
+
+
+def _check_term(term, bound: set, rule: str) -> None:
+    if isinstance(term, _Var):
+        if term.name == "_":
+            raise RegoError(
+                f"Wildcard '_' in rule {rule!r} is not supported; use 'some x in coll'"
+            )
+        if term.name not in bound:
+            raise RegoError(
+                f"Unbound variable {term.name!r} in rule {rule!r}; bind it with "
+                f"':=' or 'some x in coll' before use"
+            )
+    elif isinstance(term, _Ref):
+        _check_term(term.base, bound, rule)
+        for key_term in term.path:
+            _check_term(key_term, bound, rule)
+    elif isinstance(term, (_Call, _Array)):
+        for item in term.args if isinstance(term, _Call) else term.items:
+            _check_term(item, bound, rule)
+    elif isinstance(term, _Object):
+        for key_term, value_term in term.items:
+            _check_term(key_term, bound, rule)
+            _check_term(value_term, bound, rule)
+
+
+# === Evaluation ===
+
+def _rego_equal(a, b) -> bool:
+    if isinstance(a, bool) != isinstance(b, bool):
+        return False
+    return a == b
+
+
+def _rego_in(item, coll) -> bool:
+    if isinstance(coll, dict):
+        coll = coll.values()
+    elif not isinstance(coll, (list, tuple, set, frozenset)):
+        return False
+    return any(_rego_equal(item, elem) for elem in coll)
+
+
+_ORDERING = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+class RegoPolicy:
+    """
+    A parsed Rego policy module.
+
+    Supports the subset of Rego used by Iron Book policies: `package` and
+    `import` declarations, `default` values, boolean and value rules with
+    `if { ... }` bodies, `not`, `some x in coll`, `:=` assignment,
+    comparisons, `in` membership, references into `input`, array/set/object
+    literals, and the builtins startswith, endswith, contains, count, lower,
+    upper, concat, substring and object.get. Variables must be bound with
+    `:=` or `some x in coll` before they are used; iteration over references
+    (`roles[_]`, `roles[i]` with an unbound `i`) and unification are not
+    supported. Anything else raises RegoError when the policy is parsed, so
+    unsupported policies are never evaluated with partial semantics.
+    """
+
+    def __init__(self, source: str):
+        """
+        Parse a policy.
+
+        Args:
+            source: Rego source text
+
+        Raises:
+            RegoError: If the policy uses unsupported syntax
+        """
+        self.source = source
+        self.defaults, self.rules = _Parser(source).parse_module()
+        _check_bindings(self.defaults, self.rules)
+
+    def evaluate(self, policy_input: dict) -> Tuple[bool, Optional[str]]:
+        """
+        Evaluate the policy's allow/deny decision.
+
+        A request is allowed when `allow` is true and no `deny` rule matches.
+
+        Args:
+            policy_input: The `input` document
+
+        Returns:
+            Tuple of (allow, reason)
+        """
+        memo = {}
+        if "deny" in self.rules and self._rule_value("deny", policy_input, memo) is True:
+            return False, "Denied by policy deny rule"
+        if self._rule_value("allow", policy_input, memo) is True:
+            return True, None
+        return False, "Policy denied access"
+
+    def _rule_value(self, name: str, policy_input: dict, memo: dict):
+        if name in memo:
+            return memo[name]
+        memo[name] = UNDEFINED  # guards against recursive rules
+
+        result = UNDEFINED
+        for rule in self.rules.get(name, []):
+            for env in self._eval_body(rule.body, 0, {}, policy_input, memo):
+                result = True if rule.value is None else self._eval_term(rule.value, env, policy_input, memo)
+                break
+            if result is not UNDEFINED:
+                break
+
+        if result is UNDEFINED and name in self.defaults:
+            result = self._eval_term(self.defaults[name], {}, policy_input, memo)
+        memo[name] = result
+        return result
+
+    def _eval_body(self, exprs: list, index: int, env: dict, policy_input: dict, memo: dict):
+        """Yield every variable binding that satisfies exprs[index:]."""
+        if index == len(exprs):
+            yield env
+            return
+
+        expr = exprs[index]
+        op = expr[0]
+
+        if op == "some":
+            _, names, coll_term = expr
+            coll = self._eval_term(coll_term, env, policy_input, memo)
+            if isinstance(coll, dict):
+                pairs = list(coll.items())
+            elif isinstance(coll, (list, tuple)):
+                pairs = list(enumerate(coll))
+            else:
+                return
+            for key, value in pairs:
+                bound = dict(env)
+                if len(names) == 1:
+                    bound[names[0]] = value
+                else:
+                    bound[names[0]], bound[names[1]] = key, value
+                yield from self._eval_body(exprs, index + 1, bound, policy_input, memo)
+            return
+
+        if op == "assign":
+            _, name, term = expr
+            value = self._eval_term(term, env, policy_input, memo)
+            if value is UNDEFINED:
+                return
+            bound = dict(env)
+            bound[name] = value
+            yield from self._eval_body(exprs, index + 1, bound, policy_input, memo)
+            return
+
+        if self._eval_expr(expr, env, policy_input, memo):
+            yield from self._eval_body(exprs, index + 1, env, policy_input, memo)
+
+    def _eval_expr(self, expr: tuple, env: dict, policy_input: dict, memo: dict) -> bool:
+        op = expr[0]
+
+        if op == "not":
+            inner = expr[1]
+            return not any(True for _ in self._eval_body([inner], 0, env, policy_input, memo))
+
+        if op == "compare":
+            _, cmp, left_term, right_term = expr
+            left = self._eval_term(left_term, env, policy_input, memo)
+            right = self._eval_term(right_term, env, policy_input, memo)
+            if left is UNDEFINED or right is UNDEFINED:
+                return False
+            if cmp == "==":
+                return _rego_equal(left, right)
+            if cmp == "!=":
+                return not _rego_equal(left, right)
+            try:
+                return _ORDERING[cmp](left, right)
+            except TypeError:
+                return False
+
+        if op == "in":
+            _, item_term, coll_term = expr
+            item = self._eval_term(item_term, env, policy_input, memo)
+            coll = self._eval_term(coll_term, env, policy_input, memo)
+            if item is UNDEFINED or coll is UNDEFINED:
+                return False
+            return _rego_in(item, coll)
+
+        value = self._eval_term(expr[1], env, policy_input, memo)
+        return value is not UNDEFINED and value is not False
+
+    def _eval_term(self, term, env: dict, policy_input: dict, memo: dict):
+        if isinstance(term, _Const):
+            return term.value
+
+        if isinstance(term, _Var):
+            if term.name in env:
+                return env[term.name]
+            if term.name == "input":
+                return policy_input
+            if term.name in self.rules or term.name in self.defaults:
+                return self._rule_value(term.name, policy_input, memo)
+            return UNDEFINED
+
+        if isinstance(term, _Ref):
+            value = self._eval_term(term.base, env, policy_input, memo)
+            for key_term in term.path:
+                key = self._eval_term(key_term, env, policy_input, memo)
+                if isinstance(value, dict) and isinstance(key, str):
+                    value = value.get(key, UNDEFINED)
+                elif isinstance(value, list) and isinstance(key, int) and not isinstance(key, bool):
+                    value = value[key] if 0 <= key < len(value) else UNDEFINED
+                else:
+                    return UNDEFINED
+                if value is UNDEFINED:
+                    return UNDEFINED
+            return value
+
+        if isinstance(term, _Call):
+            args = [self._eval_term(arg, env, policy_input, memo) for arg in term.args]
+            if any(arg is UNDEFINED for arg in args):
+                return UNDEFINED
+            try:
+                return _BUILTINS[term.name](*args)
+            except (TypeError, AttributeError, ValueError):
+                return UNDEFINED
+
+        if isinstance(term, _Array):
+            values = [self._eval_term(item, env, policy_input, memo) for item in term.items]
+            return UNDEFINED if any(v is UNDEFINED for v in values) else values
+
+        if isinstance(term, _Object):
+            result = {}
+            for key_term, value_term in term.items:
+                key = self._eval_term(key_term, env, policy_input, memo)
+                value = self._eval_term(value_term, env, policy_input, memo)
+                if key is UNDEFINED or value is UNDEFINED:
+                    return UNDEFINED
+                result[key] = value
+            return result
+
+        raise RegoError(f"Cannot evaluate {term!r}")
+
+
+def build_policy_input(agent_info: Mapping, action: str, resource: str, context: Optional[dict]) -> dict:
+    """
+    Build the `input` document for local evaluation.
+
+    Mirrors what Iron Book evaluates remotely: the action, resource and
+    context, with the agent name and MCP capabilities added to the context.
+
+    Args:
+        agent_info: AgentInfo (or an agent info dict)
+        action: The action being performed
+        resource: The resource being accessed
+        context: Policy evaluation context
+
+    Returns:
+        The policy input document
+    """
+    full_context = dict(context or {})
+    full_context.setdefault("agent_name", agent_info.get("agent_name"))
+    full_context.setdefault("capabilities", list(agent_info.get("capabilities") or []))
+    return {
+        "agent_did": agent_info.get("agent_did"),
+        "action": action,
+        "resource": resource,
+        "context": full_context,
+    }
+
+
+# === Policy bundles ===
+
+class _Bundle:
+    __slots__ = ("policy", "fetched_at", "refresh_task")
+
+    def __init__(self, policy: RegoPolicy, fetched_at: float):
+        self.policy = policy
+        self.fetched_at = fetched_at
+        self.refresh_task: Optional[asyncio.Task] = None
+
+
+class PolicyBundleStore:
+    """
+    Fetches Rego policies once and keeps them in memory and on disk.
+
+    Policy sources are looked up in order:
+
+    1. `sources`, a mapping of policy ID to a local `.rego` file path
+    2. `IronBookClient.get_policy(policy_id)`, if the SDK exposes it
+
+    Fetched policies are written to `cache_dir/{policy_id}.rego`, so a restart
+    loads them from disk without an upstream call. Bundles older than
+    `refresh_interval` are served while a background task refreshes them.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = ".ironbook/policies",
+        sources: Optional[dict] = None,
+        refresh_interval: float = 300.0
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            cache_dir: Directory for cached policy files
+            sources: Optional mapping of policy ID to a local .rego file
+            refresh_interval: Seconds before a bundle is refreshed
+        """
+        self.cache_dir = cache_dir
+        self.sources = sources or {}
+        self.refresh_interval = refresh_interval
+        self._bundles: dict = {}
+
+    async def get(self, ironbook_client: IronBookClient, policy_id: str) -> RegoPolicy:
+        """
+        Get the parsed policy for a policy ID.
+
+        Args:
+            ironbook_client: Iron Book SDK client instance
+            policy_id: Iron Book policy ID
+
+        Returns:
+            The parsed policy
+
+        Raises:
+            RegoError: If the policy cannot be fetched or uses unsupported Rego
+        """
+        bundle = self._bundles.get(policy_id)
+        if bundle is None:
+            bundle = await asyncio.to_thread(self._load_from_disk, policy_id)
+            if bundle is None:
+                bundle = await self._fetch(ironbook_client, policy_id)
+            self._bundles[policy_id] = bundle
+
+        if time.time() - bundle.fetched_at > self.refresh_interval:
+            self._schedule_refresh(ironbook_client, policy_id, bundle)
+        return bundle.policy
+
+    def _cache_path(self, policy_id: str) -> str:
+        safe_id = "".join(c for c in policy_id if c.isalnum() or c in "-_")
+        return os.path.join(self.cache_dir, f"{safe_id}.rego")
+
+    def _load_from_disk(self, policy_id: str) -> Optional[_Bundle]:
+        path = self._cache_path(policy_id)
+        try:
+            with open(path, encoding="utf-8") as f:
+                source = f.read()
+            return _Bundle(RegoPolicy(source), os.path.getmtime(path))
+        except FileNotFoundError:
+            return None
+        except (OSError, RegoError) as e:
+            logger.warning(f"Ignoring cached policy {path}: {e}")
+            return None
+
+    def _save_to_disk(self, policy_id: str, source: str) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(policy_id)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(source)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache policy {policy_id} on disk: {e}")
+
+    async def _fetch(self, ironbook_client: IronBookClient, policy_id: str) -> _Bundle:
+        source = await self._fetch_source(ironbook_client, policy_id)
+        policy = RegoPolicy(source)
+        await asyncio.to_thread(self._save_to_disk, policy_id, source)
+        logger.info(f"Loaded policy bundle for {policy_id}")
+        return _Bundle(policy, time.time())
+
+    async def _fetch_source(self, ironbook_client: IronBookClient, policy_id: str) -> str:
+        if policy_id in self.sources:
+            path = self.sources[policy_id]
+            return await asyncio.to_thread(_read_text, path)
+
+        get_policy = getattr(ironbook_client, "get_policy", None)
+        if get_policy is None:
+            raise RegoError(
+                f"No source for policy {policy_id}: the Iron Book SDK does not expose "
+                f"get_policy, so configure PolicyBundleStore(sources={{...}})"
+            )
+
+        policy = await get_policy(policy_id)
+        # The SDK's Policy has policy_content; the REST API returns policyContent
+        for field in ("policy_content", "policyContent", "content", "rego", "source", "policy"):
+            value = policy.get(field) if isinstance(policy, dict) else getattr(policy, field, None)
+            if isinstance(value, str):
+                return value
+        raise RegoError(f"Iron Book returned no Rego source for policy {policy_id}")
+
+    def _schedule_refresh(self, ironbook_client: IronBookClient, policy_id: str, bundle: _Bundle) -> None:
+        if bundle.refresh_task is not None and not bundle.refresh_task.done():
+            return
+
+        async def refresh():
+            try:
+                self._bundles[policy_id] = await self._fetch(ironbook_client, policy_id)
+            except Exception as e:
+                logger.warning(f"Failed to refresh policy bundle {policy_id}: {e}")
+                bundle.fetched_at = time.time()  # back off until the next interval
+
+        bundle.refresh_task = asyncio.create_task(refresh())
+
+
+def _read_text(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+# === Evaluator ===
+
+class LocalPolicyEvaluator:
+    """
+    Evaluates Iron Book policies in-process.
+
+    Modes:
+
+    - "local": decisions are made locally; Iron Book is only contacted for
+      bundle refreshes. If a policy cannot be evaluated locally the check
+      falls back to the remote decision API.
+    - "shadow": decisions still come from Iron Book, and each one is compared
+      with the local result. Mismatches are logged and counted, and stats()
+      reports local and remote latency side by side.
+
+    An optional `audit_fn(record)` receives every local decision so it can be
+    shipped to an audit sink; it may be sync or async.
+    """
+
+    def __init__(
+        self,
+        store: Optional[PolicyBundleStore] = None,
+        mode: str = "local",
+        audit_fn: Optional[Callable[[dict], Any]] = None
+    ):
+        """
+        Initialize the evaluator.
+
+        Args:
+            store: Policy bundle store (defaults to PolicyBundleStore())
+            mode: "local" or "shadow"
+            audit_fn: Optional callback receiving each local decision record
+        """
+        if mode not in ("local", "shadow"):
+            raise ValueError(f"Unknown local evaluation mode: {mode!r}")
+
+        self.store = store or PolicyBundleStore()
+        self.mode = mode
+        self.audit_fn = audit_fn
+        self.local_checks = 0
+        self.local_errors = 0
+        self.local_latency_total = 0.0
+        self.remote_checks = 0
+        self.remote_latency_total = 0.0
+        self.shadow_compared = 0
+        self.shadow_mismatches = 0
+        # Async audit deliveries (kept referenced until done)
+        self._audit_tasks: set = set()
+
+    async def decide(
+        self,
+        ironbook_client: IronBookClient,
+        agent_info: Mapping,
+        action: str,
+        resource: str,
+        context: Optional[dict],
+        policy_id: str
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Evaluate a policy check locally.
+
+        Returns:
+            Tuple of (allow, reason)
+
+        Raises:
+            RegoError: If the policy cannot be fetched or evaluated locally
+        """
+        policy = await self.store.get(ironbook_client, policy_id)
+        policy_input = build_policy_input(agent_info, action, resource, context)
+
+        started = time.perf_counter()
+        allow, reason = policy.evaluate(policy_input)
+        self.local_latency_total += time.perf_counter() - started
+        self.local_checks += 1
+
+        self._audit({
+            "agent_did": agent_info.get("agent_did"),
+            "policy_id": policy_id,
+            "action": action,
+            "resource": resource,
+            "allow": allow,
+            "reason": reason,
+            "timestamp": time.time(),
+        })
+        return allow, reason
+
+    async def shadow(
+        self,
+        ironbook_client: IronBookClient,
+        agent_info: Mapping,
+        action: str,
+        resource: str,
+        context: Optional[dict],
+        policy_id: str,
+        remote_allow: bool,
+        remote_latency: float
+    ) -> None:
+        """Compare a remote decision with the local one and record the result."""
+        self.remote_checks += 1
+        self.remote_latency_total += remote_latency
+
+        try:
+            local_allow, _ = await self.decide(
+                ironbook_client, agent_info, action, resource, context, policy_id
+            )
+        except Exception as e:
+            self.local_errors += 1
+            logger.warning(f"Shadow evaluation failed for {policy_id}: {e}")
+            return
+
+        self.shadow_compared += 1
+        if local_allow != remote_allow:
+            self.shadow_mismatches += 1
+            logger.warning(
+                f"Shadow mismatch: policy={policy_id}, action={action}, resource={resource}, "
+                f"local={'allow' if local_allow else 'deny'}, remote={'allow' if remote_allow else 'deny'}"
+            )
+
+    def stats(self) -> dict:
+        """Return local/remote decision counts, latency and shadow mismatches."""
+        local_avg = self.local_latency_total / self.local_checks if self.local_checks else 0.0
+        remote_avg = self.remote_latency_total / self.remote_checks if self.remote_checks else 0.0
+        return {
+            "mode": self.mode,
+            "local_checks": self.local_checks,
+            "local_errors": self.local_errors,
+            "local_latency_avg": local_avg,
+            "remote_checks": self.remote_checks,
+            "remote_latency_avg": remote_avg,
+            "shadow_compared": self.shadow_compared,
+            "shadow_mismatches": self.shadow_mismatches,
+        }
+
+    def _audit(self, record: dict) -> None:
+        if self.audit_fn is None:
+            return
+        try:
+            result = self.audit_fn(record)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._audit_tasks.add(task)
+                task.add_done_callback(self._audit_tasks.discard)
+        except Exception as e:
+            logger.warning(f"Audit callback failed: {e}")
@@ -0,0 +1,425 @@
+"""Prometheus metrics for policy enforcement, without external dependencies."""
+
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (metrics, tool, policy_id) of the policy check running in this context, so
+# stages deep in agent.py and policy.py are attributed without threading
+# labels through every call
+_current_check: ContextVar[Optional[tuple]] = ContextVar("fastmcp_ironbook_current_check", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+# Labels with unbounded values; they are folded into "other" past max_series
+_CAPPED_LABELS = frozenset({"tool", "policy_id", "agent"})
+
+
+class _Metric:
+    """A labelled metric family with a cap on the number of series."""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str], max_series: int):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self._capped = tuple(name in _CAPPED_LABELS for name in self.labelnames)
+        self._series: dict = {}
+        self._lock = threading.Lock()
+        self._overflowed = False
+
+    def _get(self, values: tuple):
+        series = self._series.get(values)
+        if series is not None:
+            return series
+        with self._lock:
+            if (
+                any(self._capped)
+                and len(self._series) >= self.max_series
+                and values not in self._series
+            ):
+                if not self._overflowed:
+                    logger.warning(
+                        f"Metric {self.name} reached {self.max_series} series; "
+                        f"further label values are reported as \"other\""
+                    )
+                    self._overflowed = True
+                values = tuple(
+                    "other" if capped else value for capped, value in zip(self._capped, values)
+                )
+            series = self._series.get(values)
+            if series is None:
+                series = self._new_series()
+                self._series[values] = series
+            return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._series.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in items:
+            lines.extend(self._render_series(values, series))
+        return lines
+
+
+class _Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return [0]
+
+    def inc(self, *values: str) -> None:
+        self._get(values)[0] += 1
+
+    def _render_series(self, values: tuple, series: list) -> list:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {series[0]}"]
+
+
+class _Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str],
+        max_series: int,
+        buckets: Sequence[float]
+    ):
+        super().__init__(name, help_text, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        # Per-bucket counts, then sum, then count
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+    def observe(self, value: float, *values: str) -> None:
+        series = self._get(values)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def _render_series(self, values: tuple, series: list) -> list:
+        lines = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series):
+            running += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {running}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+        lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+def _render_samples(name: str, kind: str, help_text: str, samples: Sequence[tuple]) -> list:
+    """Render a metric from (labels, value) samples read at scrape time."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{labels} {_format_value(value)}")
+    return lines
+
+
+def _render_snapshot(name: str, help_text: str, snapshot: dict) -> list:
+    """Render a histogram from a {"buckets", "sum", "count"} snapshot with cumulative buckets."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for bound, count in snapshot["buckets"].items():
+        lines.append(f'{name}_bucket{{le="{_format_value(bound)}"}} {count}')
+    lines.append(f"{name}_sum {_format_value(snapshot['sum'])}")
+    lines.append(f"{name}_count {snapshot['count']}")
+    return lines
+
+
+class IronBookMetrics:
+    """
+    Metrics for Iron Book policy enforcement.
+
+    Records, per guard that is given this object:
+
+    - `<namespace>_stage_duration_seconds{stage}`: histogram of each
+      enforcement stage: "org_settings", "registration", "token", "decision",
+      "local" and "context" (context_fn execution)
+    - `<namespace>_check_duration_seconds{tool,policy_id}`: histogram of the
+      total time a tool call spends in policy enforcement
+    - `<namespace>_decisions_total{tool,policy_id,outcome}`: counter of
+      "allow", "deny" and "error" outcomes
+    - `<namespace>_decision_cache_total{tool,policy_id,result}`: counter of
+      decision cache "hit" and "miss" results
+    - `<namespace>_prefetch_decisions_total{tool,policy_id,outcome}`:
+      counter of tools/list prefetch outcomes, which are kept out of the
+      per-call metrics above
+
+    The guard also registers its circuit breaker, upstream scheduler and
+    token pool with watch(); their state is read on each render():
+
+    - `<namespace>_circuit_breaker_state{state}`: 1 for the current state
+      ("closed", "open" or "half_open"), 0 for the others
+    - `<namespace>_circuit_breaker_opens_total` and
+      `<namespace>_circuit_breaker_rejections_total`: counters
+    - `<namespace>_scheduler_wait_seconds`: histogram of time spent queued
+    - `<namespace>_scheduler_queue_depth`: histogram of the queue depth seen
+      by each call on arrival
+    - `<namespace>_scheduler_in_flight`: gauge of running upstream calls
+    - `<namespace>_token_pool_total{result}`: counter of token pool "hit"
+      and "miss" results
+
+    Agent DIDs are not used as labels unless `agent_label` is set. Each
+    metric with tool, policy_id or agent labels is capped at `max_series`
+    label combinations; beyond the cap, those label values are reported as
+    "other".
+    """
+
+    def __init__(
+        self,
+        namespace: str = "fastmcp_ironbook",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        agent_label: bool = False,
+        max_series: int = 1000
+    ):
+        """
+        Initialize the metrics.
+
+        Args:
+            namespace: Prefix of every metric name
+            buckets: Histogram bucket upper bounds, in seconds
+            agent_label: Add an `agent` label (the agent DID) to the
+                         decisions counter
+            max_series: Maximum label combinations per metric
+        """
+        self.namespace = namespace
+        self.agent_label = agent_label
+        self.circuit_breaker: Optional[Any] = None
+        self.scheduler: Optional[Any] = None
+        self.token_pool: Optional[Any] = None
+        decision_labels = ("tool", "policy_id", "outcome") + (("agent",) if agent_label else ())
+        self.stage_duration = _Histogram(
+            f"{namespace}_stage_duration_seconds",
+            "Duration of policy enforcement stages in seconds.",
+            ("stage",), max_series, buckets
+        )
+        self.check_duration = _Histogram(
+            f"{namespace}_check_duration_seconds",
+            "Total policy enforcement time per tool call in seconds.",
+            ("tool", "policy_id"), max_series, buckets
+        )
+        self.decisions = _Counter(
+            f"{namespace}_decisions_total",
+            "Policy check outcomes.",
+            decision_labels, max_series
+        )
+        self.cache_results = _Counter(
+            f"{namespace}_decision_cache_total",
+            "Decision cache lookups.",
+            ("tool", "policy_id", "result"), max_series
+        )
+        self.prefetches = _Counter(
+            f"{namespace}_prefetch_decisions_total",
+            "Policy checks made to filter tools/list.",
+            ("tool", "policy_id", "outcome"), max_series
+        )
+
+    def watch(
+        self,
+        circuit_breaker: Optional[Any] = None,
+        scheduler: Optional[Any] = None,
+        token_pool: Optional[Any] = None
+    ) -> None:
+        """
+        Export the state of resilience components on each render().
+
+        Components that are None are left as they are. One component of each
+        kind is exported; watching another replaces it.
+
+        Args:
+            circuit_breaker: CircuitBreaker whose state is exported
+            scheduler: UpstreamScheduler whose queue histograms are exported
+            token_pool: TokenPool whose hit/miss counters are exported
+        """
+        if circuit_breaker is not None:
+            self.circuit_breaker = circuit_breaker
+        if scheduler is not None:
+            self.scheduler = scheduler
+        if token_pool is not None:
+            self.token_pool = token_pool
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """Record the duration of one enforcement stage."""
+        self.stage_duration.observe(seconds, stage)
+
+    def observe_check(
+        self,
+        tool: str,
+        policy_id: str,
+        outcome: str,
+        seconds: float,
+        agent: Optional[str] = None
+    ) -> None:
+        """Record the outcome and total duration of a policy check."""
+        self.check_duration.observe(seconds, tool, policy_id)
+        if self.agent_label:
+            self.decisions.inc(tool, policy_id, outcome, agent or "")
+        else:
+            self.decisions.inc(tool, policy_id, outcome)
+
+    def observe_prefetch(self, tool: str, policy_id: str, outcome: str) -> None:
+        """Record the outcome of a tools/list prefetch check."""
+        self.prefetches.inc(tool, policy_id, outcome)
+
+    def count_cache(self, tool: str, policy_id: str, hit: bool) -> None:
+        """Record a decision cache lookup."""
+        self.cache_results.inc(tool, policy_id, "hit" if hit else "miss")
+
+    @contextmanager
+    def check(self, tool: str, policy_id: str) -> Iterator[None]:
+        """
+        Attribute the stages run in this context to a tool and policy.
+
+        Args:
+            tool: Tool name
+            policy_id: Policy ID being checked
+        """
+        token = _current_check.set((self, tool, policy_id))
+        try:
+            yield
+        finally:
+            _current_check.reset(token)
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in (
+            self.stage_duration, self.check_duration, self.decisions, self.cache_results, self.prefetches
+        ):
+            lines.extend(metric.render())
+        lines.extend(self._render_components())
+        return "\n".join(lines) + "\n"
+
+    def _render_components(self) -> list:
+        """Render the watched components' current state."""
+        prefix = self.namespace
+        lines = []
+        if self.circuit_breaker is not None:
+            stats = self.circuit_breaker.stats()
+            lines.extend(_render_samples(
+                f"{prefix}_circuit_breaker_state", "gauge",
+                "Circuit breaker state (1 for the current state).",
+                [
+                    (_format_labels(("state",), (state,)), int(stats["state"] == state))
+                    for state in ("closed", "open", "half_open")
+                ]
+            ))
+            lines.extend(_render_samples(
+                f"{prefix}_circuit_breaker_opens_total", "counter",
+                "Times the circuit breaker opened.", [("", stats["opens"])]
+            ))
+            lines.extend(_render_samples(
+                f"{prefix}_circuit_breaker_rejections_total", "counter",
+                "Calls rejected by an open circuit breaker.", [("", stats["rejections"])]
+            ))
+        if self.scheduler is not None:
+            stats = self.scheduler.stats()
+            lines.extend(_render_snapshot(
+                f"{prefix}_scheduler_wait_seconds",
+                "Time upstream calls waited for a scheduler slot in seconds.",
+                stats["wait_seconds"]
+            ))
+            lines.extend(_render_snapshot(
+                f"{prefix}_scheduler_queue_depth",
+                "Scheduler queue depth seen by upstream calls on arrival.",
+                stats["queue_depth_at_arrival"]
+            ))
+            lines.extend(_render_samples(
+                f"{prefix}_scheduler_in_flight", "gauge",
+                "Upstream calls holding a scheduler slot.", [("", stats["in_flight"])]
+            ))
+        if self.token_pool is not None:
+            stats = self.token_pool.stats()
+            lines.extend(_render_samples(
+                f"{prefix}_token_pool_total", "counter",
+                "Token pool lookups.",
+                [
+                    (_format_labels(("result",), ("hit",)), stats["hits"]),
+                    (_format_labels(("result",), ("miss",)), stats["misses"]),
+                ]
+            ))
+        return lines
+
+    def serve(self, port: int = 9464, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve the metrics over HTTP from a background thread.
+
+        Any GET path returns the metrics. Call shutdown() on the returned
+        server to stop it.
+
+        Args:
+            port: Port to listen on (0 = pick a free port)
+            addr: Address to bind
+
+        Returns:
+            The running HTTP server
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics request: {format % args}")
+
+        server = ThreadingHTTPServer((addr, port), Handler)
+        thread = threading.Thread(target=server.serve_forever, name="ironbook-metrics", daemon=True)
+        thread.start()
+        logger.info(f"Serving Iron Book metrics on http://{addr}:{server.server_address[1]}/metrics")
+        return server
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration for the policy check running in this context, if any."""
+    check = _current_check.get()
+    if check is not None:
+        check[0].observe_stage(stage, seconds)
+
+
+def count_cache(hit: bool) -> None:
+    """Record a decision cache lookup for the policy check running in this context, if any."""
+    check = _current_check.get()
+    if check is not None:
+        metrics, tool, policy_id = check
+        metrics.count_cache(tool, policy_id, hit)
@@ -1,8 +1,19 @@
-"""MCP client information capture middleware."""
+"""MCP middleware: client information capture and policy enforcement."""
 
+import asyncio
 import logging
+import time
+import weakref
+from typing import Any, Dict, Optional, Sequence, Union
+from fastmcp.exceptions import ToolError
 from fastmcp.server.middleware.middleware import Middleware, MiddlewareContext, CallNext
 import mcp.types as mt
+from .agent import RegistrationUnavailableError
+from .deadline import DeadlineExceededError
+from .limiter import LoadShedError
+from .guard import IronBookGuard, ToolPolicy
+from .session import current_session, current_session_id
+from .tracing import request_span, span
 
 logger = logging.getLogger(__name__)
 
@@ -15,17 +26,77 @@ class ClientInfoMiddleware(Middleware):
     https://modelcontextprotocol.io/specification/2025-03-26/basic/lifecycle#initialization
     
     This provides standardized client identification with name, version, and capabilities.
+    
+    Client info is stored per MCP session ID, so concurrent sessions from
+    different clients are identified independently. FastMCP does not expose
+    the session while initialize is handled, so a session is cached when its
+    first request arrives, from the clientInfo it sent at initialize. Entries
+    are evicted when the underlying session object is released.
+    
+    With warm_guard, agent registration (and token pool filling) starts in a
+    background task as soon as clientInfo arrives, so the first tool call
+    awaits a registration that is already running instead of starting cold.
     """
     
-    def __init__(self, cache_dict: dict):
+    def __init__(self, cache_dict: dict, warm_guard: Optional[IronBookGuard] = None):
         """
         Initialize middleware with a cache dictionary.
         
         Args:
             cache_dict: Dictionary to store captured client info
+            warm_guard: Optional guard whose agent registration is started at
+                        initialize (use the guard's client_info_cache as
+                        cache_dict)
         """
         super().__init__()
         self.cache = cache_dict
+        self.warm_guard = warm_guard
+        self._warm_tasks: set = set()
+    
+    def evict(self, session_id: str) -> None:
+        """
+        Drop cached client info for a session.
+        
+        Args:
+            session_id: MCP session ID to evict
+        """
+        if self.cache.pop(session_id, None) is not None:
+            logger.info(f"Evicted MCP client info for session {session_id}")
+    
+    def _track_session(self, fastmcp_context: Any, client_info: Optional[dict] = None) -> None:
+        """
+        Cache client info under the session's ID and schedule its eviction.
+        
+        Does nothing if no session is available or it is already cached.
+        Without client_info, it is read from the session's initialize params.
+        """
+        session = current_session(fastmcp_context)
+        if session is None:
+            return
+        session_id = current_session_id(fastmcp_context)
+        if session_id is None or session_id in self.cache:
+            return
+        
+        if client_info is None:
+            client_info = _client_info(getattr(session, "client_params", None))
+        if client_info is None:
+            return
+        
+        self.cache[session_id] = client_info
+        try:
+            weakref.finalize(session, self.evict, session_id)
+        except Exception as e:
+            logger.debug(f"Could not track session lifetime for {session_id}: {e}")
+        logger.info(
+            f"Cached MCP client info for session {session_id}: "
+            f"{client_info['name']} v{client_info['version']}"
+        )
+    
+    def _start_warm(self, client_info: dict) -> None:
+        """Start background registration for a client, keeping a reference to the task."""
+        task = asyncio.create_task(self.warm_guard.warm(client_info=client_info))
+        self._warm_tasks.add(task)
+        task.add_done_callback(self._warm_tasks.discard)
     
     async def on_initialize(
         self,
@@ -34,44 +105,233 @@ class ClientInfoMiddleware(Middleware):
     ) -> None:
         """Capture clientInfo and capabilities from MCP initialization"""
         try:
-            params = context.message.params
-            client_info = params.clientInfo if params.clientInfo else None
-            capabilities = params.capabilities if params.capabilities else None
-            
-            # Convert capabilities object to dict for easier handling
-            capabilities_dict = {}
-            if capabilities:
-                try:
-                    # Try to convert to dict using vars() or model_dump()
-                    if hasattr(capabilities, 'model_dump'):
-                        capabilities_dict = capabilities.model_dump()
-                    elif hasattr(capabilities, 'dict'):
-                        capabilities_dict = capabilities.dict()
-                    else:
-                        # Fallback: extract attributes
-                        capabilities_dict = {k: v for k, v in vars(capabilities).items() if not k.startswith('_')}
-                except Exception as e:
-                    logger.warning(f"Could not convert capabilities to dict: {e}")
-            
+            client_info = _client_info(context.message.params)
             if client_info:
-                client_name = client_info.name if hasattr(client_info, 'name') else ""
-                client_version = client_info.version if hasattr(client_info, 'version') else ""
-                
-                capability_names = list(capabilities_dict.keys()) if capabilities_dict else []
                 logger.info(
-                    f"MCP Initialize: Client connected - {client_name or 'unnamed'} "
-                    f"v{client_version or 'unknown'} with capabilities: {capability_names or 'none'}"
+                    f"MCP Initialize: Client connected - {client_info['name']} "
+                    f"v{client_info['version'] or 'unknown'} with capabilities: "
+                    f"{list(client_info['capabilities']) or 'none'}"
                 )
+                # FastMCP 2.x has no session during initialize; it is then
+                # tracked from the session's first request instead
+                self._track_session(context.fastmcp_context, client_info)
                 
-                if client_name:
-                    self.cache["default"] = {
-                        "name": client_name,
-                        "version": client_version or None,
-                        "capabilities": capabilities_dict
-                    }
-                    logger.info(f"Cached MCP client info: {client_name} v{client_version}")
+                if self.warm_guard is not None:
+                    self._start_warm(client_info)
         except Exception as e:
             logger.warning(f"Failed to validate request: {e}")
         
         return await call_next(context)
+    
+    async def on_request(
+        self,
+        context: MiddlewareContext[mt.Request],
+        call_next: CallNext[mt.Request, Any],
+    ) -> Any:
+        """Cache the session's client info before its first request is handled"""
+        try:
+            self._track_session(context.fastmcp_context)
+        except Exception as e:
+            logger.warning(f"Failed to track MCP session: {e}")
+        return await call_next(context)
+
 
+def _client_info(params: Any) -> Optional[dict]:
+    """Build the cached client info from initialize params, if the client is named."""
+    client_info = getattr(params, "clientInfo", None)
+    if not client_info or not getattr(client_info, "name", None):
+        return None
+    
+    # Convert capabilities object to dict for easier handling
+    capabilities = getattr(params, "capabilities", None)
+    capabilities_dict = {}
+    if capabilities:
+        try:
+            # Try to convert to dict using vars() or model_dump()
+            if hasattr(capabilities, 'model_dump'):
+                capabilities_dict = capabilities.model_dump()
+            elif hasattr(capabilities, 'dict'):
+                capabilities_dict = capabilities.dict()
+            else:
+                # Fallback: extract attributes
+                capabilities_dict = {k: v for k, v in vars(capabilities).items() if not k.startswith('_')}
+        except Exception as e:
+            logger.warning(f"Could not convert capabilities to dict: {e}")
+    
+    return {
+        "name": client_info.name,
+        "version": getattr(client_info, "version", None) or None,
+        "capabilities": capabilities_dict
+    }
+
+
+class IronBookPolicyMiddleware(Middleware):
+    """
+    Enforce Iron Book policy in the MCP request pipeline.
+    
+    Policy is checked in on_call_tool, before FastMCP validates arguments and
+    dispatches the tool, so denied calls are rejected as early as possible.
+    Tools are matched by name against:
+    
+    1. The tool_policies map passed to the middleware
+    2. Tools decorated with the guard's require_policy()
+    3. Every other tool, if enforce_all is set (using the guard's default policy)
+    
+    Checks go through the guard, so they share its decision cache, token pool
+    and coalescing with the decorator path. A call checked here is marked as
+    enforced, and a decorated tool does not check it again.
+    
+    With filter_tools, on_list_tools evaluates every guarded tool for the
+    current agent concurrently and hides the denied ones. Only tools whose
+    decision cannot depend on call arguments (no context_fn, or
+    context_keys=()) are evaluated at list time; the others stay listed and
+    are checked when called. Decisions land in the guard's decision cache, so
+    the first real call after listing is a cache hit.
+    """
+    
+    def __init__(
+        self,
+        guard: IronBookGuard,
+        tool_policies: Optional[Dict[str, Union[str, ToolPolicy, None]]] = None,
+        enforce_all: bool = False,
+        filter_tools: bool = False,
+        list_concurrency: int = 8
+    ):
+        """
+        Initialize the middleware.
+        
+        Args:
+            guard: The guard whose client, caches and defaults to use
+            tool_policies: Map of tool name to a policy ID, a ToolPolicy, or
+                           None (use the guard's default policy)
+            enforce_all: Also enforce the default policy on tools that are
+                         neither in tool_policies nor decorated
+            filter_tools: Hide tools the current agent is denied from tools/list
+            list_concurrency: Maximum concurrent policy checks while listing
+        """
+        super().__init__()
+        self.guard = guard
+        self.tool_policies: Dict[str, ToolPolicy] = {}
+        for name, spec in (tool_policies or {}).items():
+            if isinstance(spec, ToolPolicy):
+                self.tool_policies[name] = spec
+            else:
+                self.tool_policies[name] = ToolPolicy(policy_id=spec)
+        self.enforce_all = enforce_all
+        self.filter_tools = filter_tools
+        self.list_concurrency = list_concurrency
+    
+    def policy_for(self, tool_name: str) -> Optional[ToolPolicy]:
+        """
+        Return the policy configuration that applies to a tool.
+        
+        Args:
+            tool_name: MCP tool name
+        
+        Returns:
+            The ToolPolicy, or None if the tool is not guarded
+        """
+        tool_policy = self.tool_policies.get(tool_name) or self.guard.tool_policies.get(tool_name)
+        if tool_policy is None and self.enforce_all:
+            tool_policy = ToolPolicy()
+        return tool_policy
+    
+    async def on_call_tool(
+        self,
+        context: MiddlewareContext[mt.CallToolRequestParams],
+        call_next: CallNext[mt.CallToolRequestParams, Any],
+    ) -> Any:
+        """Check policy for the called tool before it is validated and run"""
+        tool_name = context.message.name
+        tool_policy = self.policy_for(tool_name)
+        if tool_policy is None:
+            return await call_next(context)
+        
+        meta = getattr(context.message, "meta", None)
+        with request_span(f"tools/call {tool_name}", {"ironbook.action": tool_name}, meta):
+            arguments = context.message.arguments or {}
+            with span("ironbook.context"):
+                started = time.perf_counter()
+                try:
+                    policy_context = tool_policy.build_context(arguments)
+                except Exception as e:
+                    # Arguments are not validated yet, so context_fn can fail
+                    # in any way; the call is rejected, never run unchecked
+                    raise ToolError(f"Invalid arguments for tool '{tool_name}': {e}") from e
+                if tool_policy.context_fn is not None and self.guard.metrics is not None:
+                    self.guard.metrics.observe_stage("context", time.perf_counter() - started)
+            
+            try:
+                await self.guard.enforce(
+                    action=tool_name,
+                    context=policy_context,
+                    policy_id=tool_policy.policy_id,
+                    context_keys=tool_policy.context_keys,
+                    latency_budget_ms=tool_policy.latency_budget_ms,
+                    priority=tool_policy.priority
+                )
+            except (
+                PermissionError, RegistrationUnavailableError, DeadlineExceededError, LoadShedError
+            ) as e:
+                raise ToolError(str(e)) from e
+            
+            if tool_policy is not self.guard.tool_policies.get(tool_name):
+                # A decorated tool still checks its own policy_id and context_fn
+                with span("ironbook.tool"):
+                    return await call_next(context)
+            with self.guard.enforced_call(tool_name), span("ironbook.tool"):
+                return await call_next(context)
+    
+    async def on_list_tools(
+        self,
+        context: MiddlewareContext[mt.ListToolsRequest],
+        call_next: CallNext[mt.ListToolsRequest, Sequence[Any]],
+    ) -> Sequence[Any]:
+        """Hide tools the current agent is not allowed to call"""
+        tools = await call_next(context)
+        if not self.filter_tools or not self.guard.configured:
+            return tools
+        
+        try:
+            agent_info = await self.guard.get_agent()
+        except Exception as e:
+            logger.warning(f"Cannot filter tools/list, agent unavailable: {e}")
+            return tools
+        
+        semaphore = asyncio.Semaphore(self.list_concurrency)
+        
+        async def allowed(tool: Any) -> bool:
+            tool_policy = self.policy_for(tool.name)
+            if tool_policy is None:
+                return True
+            # Decisions that depend on call arguments are left to call time
+            if tool_policy.context_fn is not None and tool_policy.context_keys != ():
+                return True
+            
+            async with semaphore:
+                try:
+                    await self.guard.enforce(
+                        action=tool.name,
+                        context={},
+                        policy_id=tool_policy.policy_id,
+                        context_keys=tool_policy.context_keys,
+                        agent_info=agent_info,
+                        latency_budget_ms=tool_policy.latency_budget_ms,
+                        priority=tool_policy.priority,
+                        prefetch=True
+                    )
+                    return True
+                except PermissionError:
+                    return False
+                except Exception as e:
+                    # Keep the tool listed; the call itself is still enforced
+                    logger.warning(f"Policy prefetch failed for tool {tool.name}: {e}")
+                    return True
+        
+        results = await asyncio.gather(*(allowed(tool) for tool in tools))
+        visible = [tool for tool, ok in zip(tools, results) if ok]
+        
+        hidden = len(tools) - len(visible)
+        if hidden:
+            logger.info(f"Hid {hidden} tool(s) denied by policy for {agent_info.agent_name}")
+        return visible
@@ -1,98 +1,684 @@
 """Iron Book policy enforcement."""
 
-import os
+import json
+import time
+import asyncio
+import hashlib
 import logging
-from typing import Optional
-from ironbook_sdk import IronBookClient, GetAuthTokenOptions, PolicyInput
+from functools import partial
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping, Optional, Tuple
+from ironbook_sdk import IronBookClient, PolicyInput
+from .agent import AgentInfo
+from .breaker import CircuitBreaker
+from .cache import DecisionCache
+from .concurrency import SingleFlight
+from .deadline import Deadline, DeadlineExceededError, within
+from .hedging import RequestHedger
+from .limiter import AdaptiveLimiter, LoadShedError
+from .local import LocalPolicyEvaluator
+from .metrics import count_cache
+from .tracing import set_attribute
+from .scheduler import UpstreamScheduler, scheduled
+from .tokens import TokenPool, build_auth_options, mint_token
 
 logger = logging.getLogger(__name__)
 
+# Shadow comparisons running off the hot path (kept referenced until done)
+_shadow_tasks: set = set()
+
+
+def _freeze(value: Any) -> Any:
+    """Return a deep, read-only snapshot of a context value."""
+    if isinstance(value, (str, bytes, int, float, type(None))):
+        return value
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if hasattr(value, "model_dump"):
+        return _freeze(value.model_dump())
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Turn a frozen context value back into plain dicts and lists."""
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    if isinstance(value, frozenset):
+        return sorted((_thaw(v) for v in value), key=repr)
+    return value
+
+
+def _canonical_default(value: Any) -> Any:
+    """JSON fallback for frozen containers and non-JSON values."""
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, frozenset):
+        return sorted(value, key=repr)
+    return str(value)
+
+
+class PolicyContext(Mapping):
+    """
+    Immutable policy evaluation context.
+    
+    Built once per policy check from the dict returned by a tool's
+    context_fn. The values are snapshotted deeply (nested dicts become
+    read-only mappings and lists become tuples), so later changes to the
+    source dict or its nested values do not affect the check. The canonical
+    hash of the context, or of any projection onto context keys, is computed
+    once and reused for the decision cache and coalescing keys.
+    """
+    
+    __slots__ = ("_data", "_digests")
+    
+    def __init__(self, data: Optional[Mapping] = None):
+        """
+        Snapshot a context.
+        
+        Args:
+            data: Context mapping; nested mappings, lists and pydantic models
+                  are supported
+        """
+        self._data = _freeze(dict(data or {}))
+        self._digests: dict = {}
+    
+    @classmethod
+    def of(cls, context: Optional[Mapping]) -> "PolicyContext":
+        """Return `context` if it is already a PolicyContext, else snapshot it."""
+        if isinstance(context, cls):
+            return context
+        if not context:
+            return _EMPTY_CONTEXT
+        return cls(context)
+    
+    def digest(self, context_keys: Optional[Iterable[str]] = None) -> str:
+        """
+        Canonical hash of the decision-relevant part of the context.
+        
+        Args:
+            context_keys: Keys that affect the decision. None means the whole
+                          context is relevant; an empty iterable means none is.
+        
+        Returns:
+            Hex digest that is stable across key order at every depth
+        """
+        if context_keys is not None:
+            context_keys = tuple(context_keys)
+        digest = self._digests.get(context_keys)
+        if digest is None:
+            data = self._data
+            if context_keys is not None:
+                data = {k: data[k] for k in context_keys if k in data}
+            canonical = json.dumps(
+                data, sort_keys=True, separators=(",", ":"), default=_canonical_default
+            )
+            digest = hashlib.sha256(canonical.encode()).hexdigest()
+            self._digests[context_keys] = digest
+        return digest
+    
+    def to_dict(self) -> dict:
+        """Return a mutable deep copy as plain dicts and lists."""
+        return _thaw(self._data)
+    
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+    
+    def __iter__(self):
+        return iter(self._data)
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PolicyContext):
+            return self.digest() == other.digest()
+        return NotImplemented
+    
+    def __hash__(self) -> int:
+        return hash(self.digest())
+    
+    def __repr__(self) -> str:
+        return f"PolicyContext({self.to_dict()!r})"
+
+
+_EMPTY_CONTEXT = PolicyContext()
+
+
+def context_hash(context: Optional[Mapping], context_keys: Optional[Iterable[str]] = None) -> str:
+    """
+    Canonical hash of the decision-relevant part of a policy context.
+    
+    Args:
+        context: Policy evaluation context (dict or PolicyContext)
+        context_keys: Keys that affect the decision. None means the whole
+                      context is relevant; an empty iterable means none is.
+    
+    Returns:
+        Hex digest that is stable across key order
+    """
+    return PolicyContext.of(context).digest(context_keys)
+
+
+def decision_cache_key(
+    agent_did: str,
+    policy_id: str,
+    action: str,
+    resource: str,
+    context: Optional[Mapping] = None,
+    context_keys: Optional[Iterable[str]] = None
+) -> tuple:
+    """
+    Build the DecisionCache key for a policy check.
+    
+    Args:
+        agent_did: DID of the agent being checked
+        policy_id: Iron Book policy ID
+        action: The action being performed
+        resource: The resource being accessed
+        context: Policy evaluation context (dict or PolicyContext)
+        context_keys: Context keys that affect the decision (None = all)
+    
+    Returns:
+        Hashable cache key
+    """
+    return (agent_did, policy_id, action, resource, context_hash(context, context_keys))
+
+
+class DecisionBatcher:
+    """
+    Micro-batch concurrent policy decisions.
+    
+    Decisions requested within `window_ms` of each other, up to `max_batch`
+    of them, are sent together and the results are fanned back to the
+    waiting checks. By default the batch is sent as concurrent
+    policy_decision requests over the client's shared connection pool. If
+    the Iron Book client has a batch decision endpoint, name its method in
+    `batch_method` (it takes a list of PolicyInput and returns decisions in
+    the same order) and each batch is sent as one request.
+    
+    A batch is flushed as soon as it is full, so the window only adds
+    latency at low load, where batches do not fill up. With an
+    UpstreamScheduler, checks wait for their batch without holding a slot;
+    only the send is scheduled.
+    """
+    
+    def __init__(
+        self,
+        window_ms: float = 2.0,
+        max_batch: int = 64,
+        batch_method: Optional[str] = None
+    ):
+        """
+        Initialize the batcher.
+        
+        Args:
+            window_ms: Longest a decision waits for others to join its batch
+            max_batch: Most decisions in one batch
+            batch_method: Optional name of the client's batch decision
+                          method (None = concurrent single decisions)
+        """
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.batch_method = batch_method
+        self._pending: dict = {}
+        self._timers: dict = {}
+        self._tasks: set = set()
+        self.batches = 0
+        self.decisions = 0
+    
+    async def decide(
+        self,
+        ironbook_client: IronBookClient,
+        policy_input: PolicyInput,
+        scheduler: Optional[UpstreamScheduler] = None,
+        priority: int = 0
+    ) -> Any:
+        """
+        Request a decision as part of the next batch.
+        
+        Args:
+            ironbook_client: Iron Book SDK client instance
+            policy_input: The decision request
+            scheduler: Optional upstream scheduler the batch is sent through
+            priority: Scheduling priority of this decision (higher goes first)
+        
+        Returns:
+            The Iron Book decision
+        """
+        key = (id(ironbook_client), id(scheduler))
+        waiter = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(key, (ironbook_client, scheduler, []))[2]
+        batch.append((policy_input, waiter, priority))
+        
+        if len(batch) >= self.max_batch:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = asyncio.get_running_loop().call_later(
+                self.window, self._flush, key
+            )
+        return await waiter
+    
+    def stats(self) -> dict:
+        """Return batch and decision counts and the mean batch size."""
+        return {
+            "batches": self.batches,
+            "decisions": self.decisions,
+            "mean_batch_size": self.decisions / self.batches if self.batches else 0.0,
+        }
+    
+    def _flush(self, key: tuple) -> None:
+        """Send the pending batch for a client in the background."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        ironbook_client, scheduler, batch = self._pending.pop(key, (None, None, []))
+        # Checks that gave up (deadline, cancellation) are dropped before sending
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        
+        self.batches += 1
+        self.decisions += len(batch)
+        task = asyncio.ensure_future(self._send(ironbook_client, scheduler, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _send(
+        self,
+        ironbook_client: IronBookClient,
+        scheduler: Optional[UpstreamScheduler],
+        batch: list
+    ) -> None:
+        """Send one batch and resolve its waiters."""
+        inputs = [policy_input for policy_input, _, _ in batch]
+        try:
+            if self.batch_method is not None:
+                batch_call = getattr(ironbook_client, self.batch_method, None)
+                if not callable(batch_call):
+                    raise AttributeError(
+                        f"Iron Book client has no batch decision method {self.batch_method!r}"
+                    )
+                # One request, one slot, at the batch's highest priority
+                results = list(await scheduled(
+                    scheduler, partial(batch_call, inputs),
+                    inputs[0].agent_did, max(priority for _, _, priority in batch)
+                ))
+                if len(results) != len(inputs):
+                    raise RuntimeError(
+                        f"Batch decision returned {len(results)} results for {len(inputs)} inputs"
+                    )
+            else:
+                results = await asyncio.gather(
+                    *(
+                        scheduled(
+                            scheduler, partial(ironbook_client.policy_decision, policy_input),
+                            policy_input.agent_did, priority
+                        )
+                        for policy_input, _, priority in batch
+                    ),
+                    return_exceptions=True
+                )
+        except Exception as e:
+            results = [e] * len(batch)
+        
+        for (_, waiter, _), result in zip(batch, results):
+            if waiter.done():
+                continue
+            if isinstance(result, BaseException):
+                waiter.set_exception(result)
+            else:
+                waiter.set_result(result)
+
 
 async def enforce_policy(
     ironbook_client: IronBookClient,
-    agent_info: dict,
+    agent_info: Mapping,
     action: str,
     resource: str,
-    context: Optional[dict] = None,
-    policy_id: str = "policy_a4e4d26bdbfa4c57bc52a67952500cc7"
+    context: Optional[Mapping] = None,
+    policy_id: str = "policy_a4e4d26bdbfa4c57bc52a67952500cc7",
+    decision_cache: Optional[DecisionCache] = None,
+    context_keys: Optional[Iterable[str]] = None,
+    token_pool: Optional[TokenPool] = None,
+    coalescer: Optional[SingleFlight] = None,
+    local_evaluator: Optional[LocalPolicyEvaluator] = None,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+    deadline: Optional[Deadline] = None,
+    hedger: Optional[RequestHedger] = None,
+    scheduler: Optional[UpstreamScheduler] = None,
+    priority: int = 0,
+    limiter: Optional[AdaptiveLimiter] = None,
+    batcher: Optional[DecisionBatcher] = None
 ) -> bool:
     """
     Enforce Iron Book policy before executing a tool.
     
-    Gets a fresh auth token for each policy check (tokens are single-use).
+    Gets a fresh auth token for each policy check (tokens are single-use),
+    taken from the token pool when one is given. When a decision cache is
+    given, cached decisions are served without contacting Iron Book. When a
+    coalescer is given, concurrent checks with the same decision key share
+    one upstream evaluation, independently of caching. When a local
+    evaluator is given, the policy is evaluated in-process ("local" mode) or
+    compared against the remote decision ("shadow" mode). When a circuit
+    breaker is given, upstream calls go through it, and a failed or rejected
+    call is resolved by the policy's fail mode instead of raising; decisions
+    made by a fail mode are not cached. When a deadline is given, the token,
+    decision and local evaluation stages run with the remaining budget and
+    are cancelled when it runs out. When a hedger is given, a slow remote
+    evaluation is raced against a second one with its own token. When a
+    scheduler is given, token minting and decision calls wait for a slot in
+    it, fairly shared between agents and ordered by priority. When a limiter
+    is given, a remote evaluation beyond its adaptive concurrency limit is
+    rejected with LoadShedError; cache hits and local evaluations are never
+    shed. When a batcher is given, decision requests are micro-batched with
+    those of concurrent checks.
     
     Args:
         ironbook_client: Iron Book SDK client instance
-        agent_info: Agent information dict
+        agent_info: AgentInfo (or an agent info dict)
         action: The action being performed
         resource: The resource being accessed
-        context: Optional context for policy evaluation
+        context: Optional context for policy evaluation (dict or
+                 PolicyContext); it is snapshotted and never modified
         policy_id: Iron Book policy ID to evaluate
+        decision_cache: Optional cache of previous decisions
+        context_keys: Context keys that affect the decision, used for the
+                      cache key (None = the whole context)
+        token_pool: Optional pool of pre-minted auth tokens
+        coalescer: Optional single-flight group for identical in-flight checks
+        local_evaluator: Optional in-process policy evaluator
+        circuit_breaker: Optional circuit breaker around upstream calls
+        deadline: Optional deadline for the check
+        hedger: Optional request hedger for slow remote evaluations
+        scheduler: Optional upstream scheduler shared by all Iron Book calls
+        priority: Scheduling priority of the check (higher goes first)
+        limiter: Optional adaptive concurrency limiter for remote evaluations
+        batcher: Optional micro-batcher for decision requests
     
     Returns:
         True if allowed
         
     Raises:
         PermissionError: If policy denies access
+        DeadlineExceededError: If the deadline passes before a decision
+        LoadShedError: If the limiter sheds the check
     """
-    if not agent_info.get("vc"):
+    agent_info = AgentInfo.from_mapping(agent_info)
+    context = PolicyContext.of(context)
+    
+    if not agent_info.vc:
         logger.error(
-            f"Cannot enforce policy: Agent {agent_info.get('agent_name')} has no valid VC. "
-            f"Reason: {agent_info.get('note', 'Unknown')}"
+            f"Cannot enforce policy: Agent {agent_info.agent_name} has no valid VC. "
+            f"Reason: {agent_info.note or 'Unknown'}"
         )
         raise PermissionError(
-            f"Policy enforcement unavailable: Agent has no valid Verifiable Credential. "
-            f"Restart the MCP server to re-register the agent with Iron Book."
+            "Policy enforcement unavailable: Agent has no valid Verifiable Credential. "
+            "Registration is being retried in the background; try again shortly."
         )
     
-    base_url = os.getenv("IRONBOOK_BASE_URL", "https://api.ironbook.identitymachines.com")
+    key = None
+    if decision_cache is not None or coalescer is not None:
+        key = decision_cache_key(
+            agent_info.agent_did, policy_id, action, resource, context, context_keys
+        )
     
-    auth_options = GetAuthTokenOptions(
-        agent_did=agent_info["agent_did"],
-        vc=agent_info["vc"],
-        action=action,
-        resource=resource,
-        audience=base_url,
-        developer_did=agent_info.get("developer_did")
-    )
+    if decision_cache is not None:
+        cached = decision_cache.get(key)
+        count_cache(cached is not None)
+        set_attribute("ironbook.cache_hit", cached is not None)
+        if cached is not None:
+            if cached.allow:
+                logger.info(
+                    f"Policy ALLOW (cached): agent={agent_info.agent_did}, "
+                    f"action={action}, resource={resource}"
+                )
+                return True
+            reason = cached.reason or "Policy denied access"
+            logger.warning(
+                f"Policy DENY (cached): agent={agent_info.agent_did}, "
+                f"action={action}, resource={resource}, reason={reason}"
+            )
+            raise PermissionError(f"Access denied: {reason}")
     
     try:
-        token_data = await ironbook_client.get_auth_token(auth_options)
-        fresh_token = token_data["access_token"]
-    except Exception as e:
-        logger.error(f"Failed to get Iron Book auth token: {e}")
+        if coalescer is not None:
+            # The shared evaluation runs unbounded; each caller only stops
+            # waiting for it when its own budget runs out
+            allow, reason = await within(
+                deadline,
+                coalescer.do(
+                    key,
+                    lambda: _evaluate(
+                        ironbook_client, agent_info, action, resource, context, policy_id,
+                        token_pool, local_evaluator, circuit_breaker, None, hedger,
+                        scheduler, priority, limiter, batcher
+                    )
+                ),
+                "decision",
+                record=False
+            )
+        else:
+            allow, reason = await _evaluate(
+                ironbook_client, agent_info, action, resource, context, policy_id,
+                token_pool, local_evaluator, circuit_breaker, deadline, hedger,
+                scheduler, priority, limiter, batcher
+            )
+    except (DeadlineExceededError, LoadShedError):
         raise
+    except Exception as e:
+        if circuit_breaker is None:
+            raise
+        allow, reason = await _fail_over(
+            e, circuit_breaker.fail_mode_for(policy_id), ironbook_client, agent_info,
+            action, resource, context, policy_id, decision_cache, key, local_evaluator,
+            deadline
+        )
+    else:
+        if decision_cache is not None:
+            decision_cache.put(key, policy_id, allow, reason)
+    
+    if allow:
+        logger.info(
+            f"Policy ALLOW: agent={agent_info.agent_did}, "
+            f"action={action}, resource={resource}"
+        )
+        return True
+    
+    reason = reason or "Policy denied access"
+    logger.warning(
+        f"Policy DENY: agent={agent_info.agent_did}, "
+        f"action={action}, resource={resource}, reason={reason}"
+    )
+    raise PermissionError(f"Access denied: {reason}")
+
+
+async def _evaluate(
+    ironbook_client: IronBookClient,
+    agent_info: AgentInfo,
+    action: str,
+    resource: str,
+    context: PolicyContext,
+    policy_id: str,
+    token_pool: Optional[TokenPool],
+    local_evaluator: Optional[LocalPolicyEvaluator],
+    circuit_breaker: Optional[CircuitBreaker],
+    deadline: Optional[Deadline],
+    hedger: Optional[RequestHedger] = None,
+    scheduler: Optional[UpstreamScheduler] = None,
+    priority: int = 0,
+    limiter: Optional[AdaptiveLimiter] = None,
+    batcher: Optional[DecisionBatcher] = None
+) -> Tuple[bool, Optional[str]]:
+    """
+    Evaluate a policy check locally or through the Iron Book decision API.
+    
+    Returns:
+        Tuple of (allow, reason)
+    """
+    if local_evaluator is not None and local_evaluator.mode == "local":
+        try:
+            return await within(
+                deadline,
+                local_evaluator.decide(
+                    ironbook_client, agent_info, action, resource, context.to_dict(), policy_id
+                ),
+                "local"
+            )
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            logger.warning(
+                f"Local evaluation unavailable for {policy_id}: {e}. "
+                f"Falling back to the Iron Book decision API."
+            )
+    
+    def remote():
+        # Each call is an independent attempt with its own fresh token
+        return _evaluate_remote(
+            ironbook_client, agent_info, action, resource, context, policy_id, token_pool,
+            deadline, scheduler, priority, batcher
+        )
+    
+    evaluate = remote
+    if hedger is not None:
+        evaluate = partial(hedger.run, remote)
+    
+    if circuit_breaker is not None:
+        evaluate = partial(circuit_breaker.call, evaluate)
+    
+    started = time.perf_counter()
+    if limiter is not None:
+        # Admission comes first so shed checks never count as breaker failures
+        allow, reason = await limiter.run(evaluate)
+    else:
+        allow, reason = await evaluate()
+    
+    if local_evaluator is not None and local_evaluator.mode == "shadow":
+        # Compare off the hot path; the remote decision is authoritative
+        task = asyncio.create_task(local_evaluator.shadow(
+            ironbook_client, agent_info, action, resource, context.to_dict(), policy_id,
+            allow, time.perf_counter() - started
+        ))
+        _shadow_tasks.add(task)
+        task.add_done_callback(_shadow_tasks.discard)
+    
+    return allow, reason
+
+
+async def _fail_over(
+    error: Exception,
+    fail_mode: str,
+    ironbook_client: IronBookClient,
+    agent_info: AgentInfo,
+    action: str,
+    resource: str,
+    context: PolicyContext,
+    policy_id: str,
+    decision_cache: Optional[DecisionCache],
+    key: Optional[tuple],
+    local_evaluator: Optional[LocalPolicyEvaluator],
+    deadline: Optional[Deadline]
+) -> Tuple[bool, Optional[str]]:
+    """
+    Decide a policy check that Iron Book could not answer.
+    
+    Returns:
+        Tuple of (allow, reason) from the fail mode; denies when the mode
+        cannot produce a decision
+    """
+    if fail_mode == "stale" and decision_cache is not None and key is not None:
+        cached = decision_cache.get_stale(key)
+        if cached is not None:
+            logger.warning(f"Iron Book unavailable ({error}); serving stale decision for {policy_id}")
+            return cached.allow, cached.reason
+    
+    if fail_mode == "local" and local_evaluator is not None:
+        try:
+            allow, reason = await within(
+                deadline,
+                local_evaluator.decide(
+                    ironbook_client, agent_info, action, resource, context.to_dict(), policy_id
+                ),
+                "local"
+            )
+            logger.warning(f"Iron Book unavailable ({error}); evaluated {policy_id} locally")
+            return allow, reason
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            logger.warning(f"Local fallback for {policy_id} failed: {e}")
     
-    full_context = context or {}
-    full_context["agent_name"] = agent_info.get("agent_name")
+    logger.warning(f"Iron Book unavailable ({error}); failing closed for {policy_id}")
+    return False, f"Policy service unavailable ({error})"
+
+
+async def _evaluate_remote(
+    ironbook_client: IronBookClient,
+    agent_info: AgentInfo,
+    action: str,
+    resource: str,
+    context: PolicyContext,
+    policy_id: str,
+    token_pool: Optional[TokenPool],
+    deadline: Optional[Deadline] = None,
+    scheduler: Optional[UpstreamScheduler] = None,
+    priority: int = 0,
+    batcher: Optional[DecisionBatcher] = None
+) -> Tuple[bool, Optional[str]]:
+    """
+    Mint a token and ask Iron Book for a decision.
+    
+    Returns:
+        Tuple of (allow, reason)
+    """
+    if token_pool is not None:
+        fresh_token = await within(
+            deadline,
+            token_pool.acquire(ironbook_client, agent_info, action, resource, scheduler, priority),
+            "token"
+        )
+    else:
+        auth_options = build_auth_options(agent_info, action, resource)
+        token_data = await within(
+            deadline,
+            scheduled(
+                scheduler, lambda: mint_token(ironbook_client, auth_options),
+                agent_info.agent_did, priority
+            ),
+            "token"
+        )
+        fresh_token = token_data["access_token"]
+    
+    # A fresh dict per call; the caller's context is never modified
+    full_context = context.to_dict()
+    full_context["agent_name"] = agent_info.agent_name
     
     policy_input = PolicyInput(
-        agent_did=agent_info["agent_did"],
+        agent_did=agent_info.agent_did,
         policy_id=policy_id,
         token=fresh_token,
         context=full_context
     )
     
+    # The batcher schedules the send itself, so waiting for a batch holds no slot
+    if batcher is not None:
+        decide = batcher.decide(ironbook_client, policy_input, scheduler, priority)
+    else:
+        decide = scheduled(
+            scheduler, partial(ironbook_client.policy_decision, policy_input),
+            agent_info.agent_did, priority
+        )
+    
     try:
-        decision = await ironbook_client.policy_decision(policy_input)
-        
-        if decision.allow:
-            logger.info(
-                f"Policy ALLOW: agent={agent_info['agent_did']}, "
-                f"action={action}, resource={resource}"
-            )
-            return True
-        else:
-            reason = decision.reason or "Policy denied access"
-            logger.warning(
-                f"Policy DENY: agent={agent_info['agent_did']}, "
-                f"action={action}, resource={resource}, reason={reason}"
-            )
-            raise PermissionError(f"Access denied: {reason}")
-            
-    except PermissionError:
-        raise
+        decision = await within(deadline, decide, "decision")
     except Exception as e:
         logger.error(f"Policy evaluation failed: {e}")
         raise
-
+    
+    return decision.allow, getattr(decision, "reason", None)
@@ -0,0 +1,351 @@
+"""Agent registry backends."""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Iterator, Optional
+from .agent import AgentInfo
+
+logger = logging.getLogger(__name__)
+
+
+class AgentRegistry(MutableMapping):
+    """
+    Interface for agent registry backends.
+
+    An agent registry maps agent keys (see `identify_agent()`) to the agent
+    info dicts built at registration. Any MutableMapping works as a registry,
+    and a plain dict is the in-memory default. Backends that defer I/O
+    subclass AgentRegistry and override flush() and close().
+    """
+
+    def flush(self) -> None:
+        """Write out any pending changes."""
+
+    def close(self) -> None:
+        """Flush pending changes and release resources."""
+        self.flush()
+
+
+def entry_size(value: dict) -> int:
+    """
+    Approximate the memory held by an agent info dict.
+
+    The VC dominates, so it is measured by its serialized length; the other
+    fields are covered by a fixed per-entry overhead.
+
+    Args:
+        value: Agent info dict
+
+    Returns:
+        Approximate size in bytes
+    """
+    vc = value.get("vc")
+    if vc is None:
+        vc_size = 0
+    elif isinstance(vc, (str, bytes)):
+        vc_size = len(vc)
+    else:
+        vc_size = len(json.dumps(vc, default=str))
+    return vc_size + 512
+
+
+class BoundedAgentRegistry(AgentRegistry):
+    """
+    In-memory agent registry with a size limit.
+
+    Agent keys include the client version, so a long-running server sees a
+    new key for every client release, and each entry holds a full VC. This
+    registry evicts entries once it exceeds max_entries or its approximate
+    byte budget (see entry_size()). An evicted agent is registered again on
+    its next tool call.
+
+    Eviction is least recently used ("lru") or least frequently used
+    ("lfu", ties broken by recency). A single entry larger than the byte
+    budget is still kept, on its own.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = 1000,
+        max_bytes: Optional[int] = 16 * 1024 * 1024,
+        policy: str = "lru"
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            max_entries: Maximum number of agents (None = unlimited)
+            max_bytes: Approximate memory budget in bytes (None = unlimited)
+            policy: Eviction policy, "lru" or "lfu"
+        """
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self._entries: OrderedDict = OrderedDict()
+        self._sizes: dict = {}
+        self._uses: dict = {}
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, key: str) -> dict:
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self._entries.move_to_end(key)
+        self._uses[key] += 1
+        self.hits += 1
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        # Membership checks do not count as uses; a failed one is a miss
+        if key in self._entries:
+            return True
+        self.misses += 1
+        return False
+
+    def __setitem__(self, key: str, value: dict) -> None:
+        if key in self._entries:
+            self.resident_bytes -= self._sizes[key]
+        else:
+            self._uses[key] = 0
+        size = entry_size(value)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self._uses[key] += 1
+        self.resident_bytes += size
+        self._evict(keep=key)
+
+    def __delitem__(self, key: str) -> None:
+        del self._entries[key]
+        self.resident_bytes -= self._sizes.pop(key)
+        del self._uses[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters, entry count and resident bytes."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "resident_bytes": self.resident_bytes,
+        }
+
+    def _over_budget(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.resident_bytes > self.max_bytes
+
+    def _evict(self, keep: str) -> None:
+        """Evict entries other than `keep` until the registry fits its limits."""
+        while self._over_budget() and len(self._entries) > 1:
+            candidates = (k for k in self._entries if k != keep)
+            if self.policy == "lru":
+                victim = next(candidates)
+            else:
+                # OrderedDict order breaks ties in favour of the least recent
+                victim = min(candidates, key=self._uses.__getitem__)
+            del self[victim]
+            self.evictions += 1
+            logger.info(f"Evicted agent registration for {victim}")
+
+
+class SQLiteAgentRegistry(AgentRegistry):
+    """
+    Agent registry persisted to a SQLite file.
+
+    Registrations survive restarts and deploys, so a restarted server reuses
+    the agent DID and VC it registered before instead of registering again
+    (and usually falling into the 409 fallback). The stored registrations
+    are read into memory once, when the registry is created, so lookups
+    (including lookups of unknown agents) never touch the database from the
+    event loop. Writes go to memory immediately and are written to disk by a
+    background thread (write-behind); call flush() to wait for them.
+
+    Only entries with a VC are persisted. Degraded entries from the
+    registration fallback stay in memory, so a restart retries them.
+
+    Use one database file per Iron Book organization; agent keys do not
+    include the org ID.
+    """
+
+    def __init__(self, path: str = ".ironbook/agents.db", max_age: Optional[float] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            path: SQLite database file (parent directories are created)
+            max_age: Optional seconds after which a stored registration is
+                     ignored and the agent registers again (None = forever)
+        """
+        self.path = path
+        self.max_age = max_age
+        self._entries: dict = {}
+        self._stored_at: dict = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._load()
+
+    def __getitem__(self, key: str) -> dict:
+        entry = self._entries[key]
+        if self._expired(key):
+            logger.info(f"Stored registration for {key} is older than {self.max_age}s, ignoring")
+            del self._entries[key]
+            del self._stored_at[key]
+            raise KeyError(key)
+        return entry
+
+    def __setitem__(self, key: str, value: dict) -> None:
+        self._entries[key] = value
+        self._stored_at[key] = time.time()
+        if value.get("vc"):
+            self._enqueue(("put", key, value))
+
+    def __delitem__(self, key: str) -> None:
+        del self._entries[key]
+        del self._stored_at[key]
+        self._enqueue(("delete", key, None))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([key for key in self._entries if not self._expired(key)])
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def flush(self) -> None:
+        """Block until all queued writes are on disk."""
+        if self._writer is not None:
+            self._writes.join()
+
+    def close(self) -> None:
+        """Flush pending writes, stop the writer thread and close the database."""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+            atexit.unregister(self.close)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database and create the schema on first use (caller holds the lock)."""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS agents ("
+                "agent_key TEXT PRIMARY KEY, "
+                "agent_did TEXT NOT NULL, "
+                "org_id TEXT, "
+                "info TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _load(self) -> None:
+        """Read every stored registration into memory, skipping unreadable ones."""
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT agent_key, info, updated_at FROM agents"
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read agent registry {self.path}: {e}")
+            return
+
+        for key, info, updated_at in rows:
+            try:
+                self._entries[key] = AgentInfo.from_mapping(json.loads(info))
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Ignoring unreadable stored registration for {key}: {e}")
+                continue
+            self._stored_at[key] = updated_at
+        if rows:
+            logger.info(f"Loaded {len(self._entries)} agent registration(s) from {self.path}")
+
+    def _expired(self, key: str) -> bool:
+        return self.max_age is not None and time.time() - self._stored_at[key] > self.max_age
+
+    def _enqueue(self, write: tuple) -> None:
+        """Queue a write for the background writer, starting it if needed."""
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._write_loop, name="ironbook-agent-registry", daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.close)
+        self._writes.put(write)
+
+    def _write_loop(self) -> None:
+        """Apply queued writes in batches, one transaction per batch."""
+        while True:
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            try:
+                self._apply([write for write in batch if write is not None])
+            except Exception as e:
+                logger.error(f"Failed to write agent registry {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+            if stop:
+                return
+
+    def _apply(self, writes: list) -> None:
+        """Write a batch of puts and deletes."""
+        if not writes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for op, key, value in writes:
+                    if op == "put":
+                        conn.execute(
+                            "INSERT OR REPLACE INTO agents "
+                            "(agent_key, agent_did, org_id, info, updated_at) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (
+                                key,
+                                value["agent_did"],
+                                value.get("org_id"),
+                                json.dumps(dict(value), default=str),
+                                now,
+                            ),
+                        )
+                    else:
+                        conn.execute("DELETE FROM agents WHERE agent_key = ?", (key,))
@@ -0,0 +1,195 @@
+"""Fair scheduling of upstream Iron Book calls."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Hashable, Optional, Sequence
+
+DEFAULT_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+DEFAULT_DEPTH_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class _Buckets:
+    """Cumulative histogram counts for a fixed set of upper bounds."""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        buckets = {}
+        running = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            running += count
+            buckets[bound] = running
+        return {"buckets": buckets, "sum": self.total, "count": self.count}
+
+
+class UpstreamScheduler:
+    """
+    Concurrency limiter with per-agent weighted fair queuing.
+
+    At most `max_concurrency` upstream calls run at once across all agents.
+    Calls beyond that wait in a queue. Higher `priority` calls (for example
+    latency-sensitive tools) are always dispatched first. Within a priority,
+    agents are served in proportion to their weight using start-time fair
+    queuing, so one chatty agent cannot starve the others.
+
+    The scheduler is shared: enforce_policy and get_or_register_agent run
+    their upstream calls through it when one is configured.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        weights: Optional[dict] = None,
+        default_weight: float = 1.0,
+        wait_buckets: Sequence[float] = DEFAULT_WAIT_BUCKETS,
+        depth_buckets: Sequence[float] = DEFAULT_DEPTH_BUCKETS
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency: Maximum concurrent upstream calls
+            weights: Optional per-agent weights, mapping agent DID (or agent
+                     key, for registrations) to a weight
+            default_weight: Weight of agents not in `weights`
+            wait_buckets: Upper bounds (seconds) of the queue wait histogram
+            depth_buckets: Upper bounds of the queue depth histogram
+        """
+        self.max_concurrency = max_concurrency
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self.in_flight = 0
+        self._queue: list = []
+        self._waiting = 0
+        self._queued_by_agent: dict = {}
+        self._finish_tags: dict = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._wait = _Buckets(wait_buckets)
+        self._depth = _Buckets(depth_buckets)
+        self.dispatched = 0
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], agent: Hashable, priority: int = 0) -> Any:
+        """
+        Run an upstream call once a slot is available.
+
+        Args:
+            fn: Zero-argument callable returning the awaitable to run
+            agent: Agent the call is made for (fairness key)
+            priority: Higher values are dispatched first
+
+        Returns:
+            The call's result
+        """
+        await self._acquire(agent, priority)
+        try:
+            return await fn()
+        finally:
+            self._release()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for a slot."""
+        return self._waiting
+
+    def stats(self) -> dict:
+        """Return in-flight and queued counts and the wait/depth histograms."""
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "queued_by_agent": dict(self._queued_by_agent),
+            "dispatched": self.dispatched,
+            "wait_seconds": self._wait.snapshot(),
+            "queue_depth_at_arrival": self._depth.snapshot(),
+        }
+
+    async def _acquire(self, agent: Hashable, priority: int) -> None:
+        self._depth.observe(self.queue_depth)
+        if self.in_flight < self.max_concurrency and not self._waiting:
+            self.in_flight += 1
+            self.dispatched += 1
+            self._wait.observe(0.0)
+            return
+
+        # Start-time fair queuing: an agent's next call starts after its
+        # previous one finishes in virtual time, scaled by its weight
+        weight = self.weights.get(agent, self.default_weight)
+        start_tag = max(self._virtual_time, self._finish_tags.get(agent, 0.0))
+        self._finish_tags[agent] = start_tag + 1.0 / weight
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (-priority, start_tag, next(self._sequence), agent, waiter))
+        self._waiting += 1
+        self._queued_by_agent[agent] = self._queued_by_agent.get(agent, 0) + 1
+        queued_at = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled
+                self._release()
+            else:
+                waiter.cancel()
+                self._dequeued(agent)
+            raise
+        self._wait.observe(time.monotonic() - queued_at)
+
+    def _release(self) -> None:
+        """Free a slot and hand free slots to the next waiters."""
+        self.in_flight -= 1
+        while self._queue and self.in_flight < self.max_concurrency:
+            _, start_tag, _, agent, waiter = heapq.heappop(self._queue)
+            if waiter.done():
+                continue
+            self._dequeued(agent)
+            self._virtual_time = start_tag
+            self.in_flight += 1
+            self.dispatched += 1
+            waiter.set_result(None)
+        if not self.in_flight and not self._waiting:
+            # Idle: forget finish tags so they do not grow without bound
+            self._finish_tags.clear()
+            self._virtual_time = 0.0
+
+    def _dequeued(self, agent: Hashable) -> None:
+        self._waiting -= 1
+        self._queued_by_agent[agent] -= 1
+        if not self._queued_by_agent[agent]:
+            del self._queued_by_agent[agent]
+
+
+async def scheduled(
+    scheduler: Optional[UpstreamScheduler],
+    fn: Callable[[], Awaitable[Any]],
+    agent: Hashable,
+    priority: int = 0
+) -> Any:
+    """
+    Run an upstream call through the scheduler, or directly if there is none.
+
+    Args:
+        scheduler: Optional upstream scheduler
+        fn: Zero-argument callable returning the awaitable to run
+        agent: Agent the call is made for
+        priority: Higher values are dispatched first
+
+    Returns:
+        The call's result
+    """
+    if scheduler is None:
+        return await fn()
+    return await scheduler.run(fn, agent, priority)
@@ -0,0 +1,51 @@
+"""MCP session resolution."""
+
+from typing import Any, Optional
+from fastmcp.server.dependencies import get_context
+
+# Cache slot used outside MCP requests, when there is no session to key by
+DEFAULT_SESSION_KEY = "default"
+
+
+def current_session(fastmcp_context: Optional[Any] = None) -> Optional[Any]:
+    """
+    Resolve the MCP session object for the current request.
+    
+    Args:
+        fastmcp_context: FastMCP Context to read from. Defaults to the context
+                         of the request currently being handled.
+    
+    Returns:
+        The ServerSession, or None if no session is active (FastMCP does not
+        expose it while the initialize request is handled)
+    """
+    try:
+        if fastmcp_context is None:
+            fastmcp_context = get_context()
+        request_context = fastmcp_context.request_context
+        return request_context.session if request_context is not None else None
+    except Exception:
+        return None
+
+
+def current_session_id(fastmcp_context: Optional[Any] = None) -> Optional[str]:
+    """
+    Resolve the MCP session ID for the current request.
+    
+    The ID is FastMCP's session ID, which FastMCP stores on the session
+    object the first time it is read, so every request of a session
+    resolves to the same key.
+    
+    Args:
+        fastmcp_context: FastMCP Context to read from. Defaults to the context
+                         of the request currently being handled.
+    
+    Returns:
+        The session ID, or None if no session is active
+    """
+    try:
+        if fastmcp_context is None:
+            fastmcp_context = get_context()
+        return fastmcp_context.session_id
+    except Exception:
+        return None
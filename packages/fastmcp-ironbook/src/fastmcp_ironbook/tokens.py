@@ -0,0 +1,292 @@
+"""Iron Book auth token minting and pre-minted token pools."""
+
+import os
+import asyncio
+import logging
+import time
+from collections import deque
+from functools import partial
+from typing import Optional
+from ironbook_sdk import IronBookClient, GetAuthTokenOptions
+from .agent import AgentInfo
+from .scheduler import UpstreamScheduler, scheduled
+
+logger = logging.getLogger(__name__)
+
+# Scheduling priority of background refills: below every policy check
+REFILL_PRIORITY = float("-inf")
+
+
+def build_auth_options(agent_info: AgentInfo, action: str, resource: str) -> GetAuthTokenOptions:
+    """
+    Build the token request for a policy check.
+
+    Args:
+        agent_info: Agent to mint the token for
+        action: The action being performed
+        resource: The resource being accessed
+
+    Returns:
+        Options for IronBookClient.get_auth_token
+    """
+    base_url = os.getenv("IRONBOOK_BASE_URL", "https://api.ironbook.identitymachines.com")
+
+    return GetAuthTokenOptions(
+        agent_did=agent_info.agent_did,
+        vc=agent_info.vc,
+        action=action,
+        resource=resource,
+        audience=base_url,
+        developer_did=agent_info.developer_did
+    )
+
+
+async def mint_token(ironbook_client: IronBookClient, auth_options: GetAuthTokenOptions) -> dict:
+    """
+    Mint a single-use auth token.
+
+    Args:
+        ironbook_client: Iron Book SDK client instance
+        auth_options: Token request options
+
+    Returns:
+        Token data returned by Iron Book (contains "access_token")
+    """
+    try:
+        return await ironbook_client.get_auth_token(auth_options)
+    except Exception as e:
+        logger.error(f"Failed to get Iron Book auth token: {e}")
+        raise
+
+
+class _PoolSlot:
+    """Ready tokens and refill state for one (agent, action, resource)."""
+
+    __slots__ = ("client", "auth_options", "scheduler", "tokens", "refill_task", "wakeup", "last_used")
+
+    def __init__(
+        self,
+        client: IronBookClient,
+        auth_options: GetAuthTokenOptions,
+        scheduler: Optional[UpstreamScheduler]
+    ):
+        self.client = client
+        self.auth_options = auth_options
+        self.scheduler = scheduler
+        self.tokens: deque = deque()
+        self.refill_task: Optional[asyncio.Task] = None
+        self.wakeup = asyncio.Event()
+        self.last_used = time.monotonic()
+
+
+class TokenPool:
+    """
+    Pool of pre-minted single-use auth tokens.
+
+    Tokens are single-use, so every policy check needs a fresh one. The pool
+    keeps up to `depth` ready tokens per (agent DID, action, resource) and
+    tops them up in a background task after each use, so the hot path pops a
+    ready token and only pays for the decision call. Tokens are discarded
+    `refresh_margin` seconds before they expire and replaced. Slots that are
+    not used for `idle_timeout` seconds stop refilling and are dropped.
+
+    With an UpstreamScheduler, tokens minted on a miss take a slot at the
+    check's priority, and background refills at the lowest priority, so
+    refills never delay a waiting policy check.
+    """
+
+    def __init__(
+        self,
+        depth: int = 2,
+        token_ttl: float = 60.0,
+        refresh_margin: float = 5.0,
+        idle_timeout: float = 300.0
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            depth: Ready tokens to keep per (agent, action, resource)
+            token_ttl: Token lifetime assumed when Iron Book does not return
+                       "expires_in"
+            refresh_margin: Seconds before expiry at which a token is replaced
+            idle_timeout: Seconds without use after which a slot is dropped
+        """
+        self.depth = depth
+        self.token_ttl = token_ttl
+        self.refresh_margin = refresh_margin
+        self.idle_timeout = idle_timeout
+        self._slots: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_errors = 0
+        self.refill_latency_total = 0.0
+        self.refill_latency_max = 0.0
+
+    async def acquire(
+        self,
+        ironbook_client: IronBookClient,
+        agent_info: AgentInfo,
+        action: str,
+        resource: str,
+        scheduler: Optional[UpstreamScheduler] = None,
+        priority: int = 0
+    ) -> str:
+        """
+        Take a ready token, minting one inline if the pool is empty.
+
+        Args:
+            ironbook_client: Iron Book SDK client instance
+            agent_info: Agent to mint the token for
+            action: The action being performed
+            resource: The resource being accessed
+            scheduler: Optional upstream scheduler for minting (inline and
+                       refills)
+            priority: Scheduling priority of an inline mint
+
+        Returns:
+            A fresh access token
+        """
+        key = (agent_info.agent_did, action, resource)
+        auth_options = build_auth_options(agent_info, action, resource)
+
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = _PoolSlot(ironbook_client, auth_options, scheduler)
+            self._slots[key] = slot
+        else:
+            # Pick up a re-registered agent's new VC
+            slot.client = ironbook_client
+            slot.auth_options = auth_options
+            slot.scheduler = scheduler
+        slot.last_used = time.monotonic()
+
+        self._prune(slot)
+        if slot.tokens:
+            token, _ = slot.tokens.popleft()
+            self.hits += 1
+        else:
+            self.misses += 1
+            token_data = await scheduled(
+                scheduler, partial(mint_token, ironbook_client, auth_options),
+                agent_info.agent_did, priority
+            )
+            token = token_data["access_token"]
+
+        self._schedule_refill(key, slot)
+        return token
+
+    async def warm(
+        self,
+        ironbook_client: IronBookClient,
+        agent_info: AgentInfo,
+        action: str,
+        resource: str,
+        scheduler: Optional[UpstreamScheduler] = None
+    ) -> None:
+        """
+        Start filling the pool for a key without taking a token.
+
+        Args:
+            ironbook_client: Iron Book SDK client instance
+            agent_info: Agent to mint the token for
+            action: The action that will be performed
+            resource: The resource that will be accessed
+            scheduler: Optional upstream scheduler for refills
+        """
+        key = (agent_info.agent_did, action, resource)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = _PoolSlot(
+                ironbook_client, build_auth_options(agent_info, action, resource), scheduler
+            )
+            self._slots[key] = slot
+        self._schedule_refill(key, slot)
+
+    def stats(self) -> dict:
+        """Return pool hit/miss counters and refill latency."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refills": self.refills,
+            "refill_errors": self.refill_errors,
+            "refill_latency_avg": (
+                self.refill_latency_total / self.refills if self.refills else 0.0
+            ),
+            "refill_latency_max": self.refill_latency_max,
+            "slots": len(self._slots),
+            "ready_tokens": sum(len(slot.tokens) for slot in self._slots.values()),
+        }
+
+    async def close(self) -> None:
+        """Cancel background refills and drop all tokens."""
+        tasks = [slot.refill_task for slot in self._slots.values() if slot.refill_task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._slots.clear()
+
+    def _prune(self, slot: _PoolSlot) -> None:
+        """Drop tokens that are expired or about to expire."""
+        cutoff = time.monotonic() + self.refresh_margin
+        while slot.tokens and slot.tokens[0][1] <= cutoff:
+            slot.tokens.popleft()
+
+    def _schedule_refill(self, key: tuple, slot: _PoolSlot) -> None:
+        """Start the background refill task for a slot, or wake it if it is idle."""
+        if self.depth <= 0:
+            return
+        if slot.refill_task is None or slot.refill_task.done():
+            slot.refill_task = asyncio.create_task(self._refill(key, slot))
+        else:
+            slot.wakeup.set()
+
+    async def _refill(self, key: tuple, slot: _PoolSlot) -> None:
+        """Keep a slot filled to depth and replace tokens before they expire."""
+        while True:
+            if time.monotonic() - slot.last_used > self.idle_timeout:
+                if self._slots.get(key) is slot:
+                    del self._slots[key]
+                return
+
+            self._prune(slot)
+            while len(slot.tokens) < self.depth:
+                started = time.monotonic()
+                try:
+                    token_data = await scheduled(
+                        slot.scheduler, partial(mint_token, slot.client, slot.auth_options),
+                        key[0], REFILL_PRIORITY
+                    )
+                except Exception:
+                    self.refill_errors += 1
+                    return
+
+                latency = time.monotonic() - started
+                self.refills += 1
+                self.refill_latency_total += latency
+                self.refill_latency_max = max(self.refill_latency_max, latency)
+
+                ttl = token_data.get("expires_in") or self.token_ttl
+                if ttl <= self.refresh_margin:
+                    logger.warning(
+                        f"Token lifetime {ttl}s is shorter than the pool refresh margin; "
+                        f"not pooling tokens for {key}"
+                    )
+                    return
+                slot.tokens.append((token_data["access_token"], time.monotonic() + ttl))
+
+            # Sleep until a token is taken, the oldest token needs replacing,
+            # or the slot goes idle
+            wake_at = min(
+                slot.tokens[0][1] - self.refresh_margin,
+                slot.last_used + self.idle_timeout
+            )
+            slot.wakeup.clear()
+            # asyncio.wait, unlike wait_for on Python < 3.12, never swallows a
+            # cancellation that races with the wakeup, so close() cannot hang
+            waiter = asyncio.ensure_future(slot.wakeup.wait())
+            try:
+                await asyncio.wait((waiter,), timeout=max(wake_at - time.monotonic(), 0.0) + 0.001)
+            finally:
+                waiter.cancel()
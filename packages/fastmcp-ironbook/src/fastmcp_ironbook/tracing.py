@@ -0,0 +1,128 @@
+"""Optional OpenTelemetry spans for policy enforcement."""
+
+import logging
+from contextlib import contextmanager, nullcontext
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import propagate, trace
+except ImportError:
+    trace = None
+
+# Spans of the enforcement stages, named after the Iron Book calls they make
+_STAGE_SPANS = {
+    "org_settings": "ironbook.get_org_settings",
+    "registration": "ironbook.register_agent",
+    "token": "ironbook.get_auth_token",
+    "decision": "ironbook.policy_decision",
+    "local": "ironbook.local_evaluation",
+}
+
+# Trace context keys read from MCP request _meta and HTTP headers
+_PROPAGATION_KEYS = ("traceparent", "tracestate", "baggage")
+
+_NOOP = nullcontext()
+
+_tracer = trace.get_tracer("fastmcp_ironbook") if trace is not None else None
+
+
+def tracing_enabled() -> bool:
+    """True if OpenTelemetry is installed."""
+    return _tracer is not None
+
+
+def span(name: str, attributes: Optional[dict] = None):
+    """
+    Context manager for a child span of the current span.
+
+    A shared no-op context manager is returned when OpenTelemetry is not
+    installed.
+
+    Args:
+        name: Span name
+        attributes: Optional span attributes
+    """
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def stage_span(stage: str, shared: bool = False):
+    """
+    Context manager for the span of one enforcement stage.
+
+    Args:
+        stage: Stage name ("org_settings", "registration", "token",
+               "decision" or "local")
+        shared: The stage waits on single-flight work started by another call
+    """
+    if _tracer is None:
+        return _NOOP
+    name = f"ironbook.{stage}.shared" if shared else _STAGE_SPANS.get(stage, f"ironbook.{stage}")
+    return _tracer.start_as_current_span(name)
+
+
+def request_span(name: str, attributes: Optional[dict] = None, meta: Optional[Any] = None):
+    """
+    Context manager for the root span of a guarded tool call.
+
+    If no span is active, the trace context of the incoming MCP request is
+    used as the parent: `traceparent`/`tracestate`/`baggage` from the
+    request's `_meta`, else from its HTTP headers.
+
+    Args:
+        name: Span name
+        attributes: Optional span attributes
+        meta: The request's `_meta` (defaults to the current request's)
+    """
+    if _tracer is None:
+        return _NOOP
+    return _request_span(name, attributes, meta)
+
+
+@contextmanager
+def _request_span(name: str, attributes: Optional[dict], meta: Optional[Any]) -> Iterator[Any]:
+    parent = None
+    if not trace.get_current_span().get_span_context().is_valid:
+        carrier = _request_carrier(meta)
+        if carrier:
+            parent = propagate.extract(carrier)
+    with _tracer.start_as_current_span(
+        name, context=parent, kind=trace.SpanKind.SERVER, attributes=attributes
+    ) as current:
+        yield current
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """Set an attribute on the current span, if tracing is enabled."""
+    if _tracer is not None:
+        trace.get_current_span().set_attribute(key, value)
+
+
+def _request_carrier(meta: Optional[Any]) -> dict:
+    """Collect trace context from the current MCP request."""
+    carrier = {}
+    try:
+        if meta is None:
+            from fastmcp.server.dependencies import get_context
+            meta = get_context().request_context.meta
+        if meta is not None:
+            values = meta.model_dump() if hasattr(meta, "model_dump") else dict(meta)
+            for key in _PROPAGATION_KEYS:
+                if isinstance(values.get(key), str):
+                    carrier[key] = values[key]
+    except Exception as e:
+        logger.debug(f"No MCP request _meta for trace propagation: {e}")
+
+    if not carrier:
+        try:
+            from fastmcp.server.dependencies import get_http_headers
+            headers = get_http_headers()
+            for key in _PROPAGATION_KEYS:
+                if headers.get(key):
+                    carrier[key] = headers[key]
+        except Exception as e:
+            logger.debug(f"No HTTP headers for trace propagation: {e}")
+    return carrier
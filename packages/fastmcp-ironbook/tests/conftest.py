@@ -0,0 +1,55 @@
+"""Shared fixtures for fastmcp-ironbook tests."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+
+
+class FakeIronBookClient:
+    """In-memory stand-in for IronBookClient that counts upstream calls."""
+
+    def __init__(self, allow: bool = True, delay: float = 0.0):
+        self.allow = allow
+        self.delay = delay
+        self.calls: dict = {}
+        self.policy_ids: list = []
+        self.denied_policy_ids: set = set()
+        self.decision_error: Optional[Exception] = None
+
+    def _called(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    async def get_org_settings(self):
+        self._called("org")
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(org_id="org1")
+
+    async def register_agent(self, options):
+        self._called("register")
+        await asyncio.sleep(self.delay)
+        return {
+            "agentDid": f"did:web:agents.example.com:{options.agent_name}",
+            "developerDid": options.developer_did,
+            "vc": "vc",
+        }
+
+    async def get_auth_token(self, options):
+        self._called("token")
+        await asyncio.sleep(self.delay)
+        return {"access_token": f"token-{self.calls['token']}", "expires_in": 300}
+
+    async def policy_decision(self, policy_input):
+        self._called("decision")
+        self.policy_ids.append(policy_input.policy_id)
+        await asyncio.sleep(self.delay)
+        if self.decision_error is not None:
+            raise self.decision_error
+        allow = self.allow and policy_input.policy_id not in self.denied_policy_ids
+        return SimpleNamespace(allow=allow, reason=None if allow else "denied")
+
+
+@pytest.fixture
+def client():
+    return FakeIronBookClient(delay=0.01)
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from fastmcp_ironbook import AgentInfo, RegistrationUnavailableError
+from fastmcp_ironbook.agent import get_or_register_agent
+from fastmcp_ironbook.policy import enforce_policy
+from fastmcp_ironbook.cache import OrgSettingsCache, RegistrationBackoff
+from fastmcp_ironbook.concurrency import SingleFlight
+
+
+def test_concurrent_first_calls_register_once(client):
+    client_info_cache = {"session-1": {"name": "Test Client", "version": "1.0"}}
+    registry = {}
+
+    async def main():
+        org_settings_cache = OrgSettingsCache()
+        flights = SingleFlight()
+        backoff = RegistrationBackoff()
+        return await asyncio.gather(*(
+            get_or_register_agent(
+                client,
+                client_info_cache,
+                registry,
+                org_settings_cache=org_settings_cache,
+                registration_flights=flights,
+                session_id="session-1",
+                registration_backoff=backoff
+            )
+            for _ in range(1000)
+        ))
+
+    results = asyncio.run(main())
+
+    assert client.calls == {"org": 1, "register": 1}
+    assert len({id(agent_info) for agent_info in results}) == 1
+    assert registry["test-client-agent-v1.0"] is results[0]
+
+
+def register_once(client, registry, backoff, flights=None):
+    return get_or_register_agent(
+        client,
+        {"session-1": {"name": "Test Client", "version": "1.0"}},
+        registry,
+        org_settings_cache=OrgSettingsCache(),
+        registration_flights=SingleFlight() if flights is None else flights,
+        session_id="session-1",
+        registration_backoff=backoff
+    )
+
+
+def test_failed_registration_backs_off(client):
+    registry = {}
+    backoff = RegistrationBackoff(base_delay=0.05, jitter=0.0)
+    register_agent = client.register_agent
+    failures = [ConnectionError("upstream down")]
+
+    async def flaky_register(options):
+        if failures:
+            client._called("register")
+            raise failures.pop()
+        return await register_agent(options)
+
+    client.register_agent = flaky_register
+
+    async def main():
+        with pytest.raises(ConnectionError):
+            await register_once(client, registry, backoff)
+        with pytest.raises(RegistrationUnavailableError) as blocked:
+            await register_once(client, registry, backoff)
+        assert 0 < blocked.value.retry_after <= 0.05
+        assert client.calls["register"] == 1
+
+        await asyncio.sleep(0.06)
+        return await register_once(client, registry, backoff)
+
+    agent_info = asyncio.run(main())
+
+    assert agent_info.vc == "vc"
+    assert client.calls["register"] == 2
+    assert backoff.blocked((id(registry), "test-client-agent-v1.0")) is None
+
+
+def test_degraded_agent_is_reregistered_in_the_background(client):
+    degraded = AgentInfo(
+        agent_did="did:web:agents.identitymachines.com:testclientagentv10org1",
+        agent_name="test-client-agent-v1.0-org1",
+        note="fetch failed",
+        policy_enforcement_available=False
+    )
+    registry = {"test-client-agent-v1.0": degraded}
+
+    async def main():
+        flights = SingleFlight()
+        backoff = RegistrationBackoff()
+        agent_info = await register_once(client, registry, backoff, flights)
+        assert agent_info is degraded
+        with pytest.raises(PermissionError, match="retried in the background"):
+            await enforce_policy(client, agent_info, "read", "mcp://test", policy_id="policy_1")
+
+        # The next call shares the retry that is already running
+        assert await register_once(client, registry, backoff, flights) is degraded
+        await asyncio.sleep(0.05)
+        return await register_once(client, registry, backoff, flights)
+
+    agent_info = asyncio.run(main())
+
+    assert agent_info.vc == "vc"
+    assert registry["test-client-agent-v1.0"] is agent_info
+    assert client.calls["register"] == 1
+    assert "decision" not in client.calls
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import tracemalloc
+
+from fastmcp_ironbook import AgentInfo
+from fastmcp_ironbook.policy import PolicyContext
+
+CALLS = 1000
+
+AGENT_DICT = {
+    "agent_did": "did:web:agents.example.com:a",
+    "developer_did": "did:web:identitymachines.com",
+    "vc": "vc",
+    "agent_name": "a",
+    "agent_version": "1.0",
+    "capabilities": ["tools"],
+    "identification_method": "client_info",
+    "org_id": "org1",
+}
+
+CONTEXT = {"user": "u1", "roles": ["reader", "writer"], "request": {"size": 10, "region": "eu"}}
+
+
+def allocated_per_call(fn) -> float:
+    """Bytes still allocated per call after CALLS calls, with every result kept alive."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        results = [fn() for _ in range(CALLS)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert len(results) == CALLS
+    return (after - before) / CALLS
+
+
+def dict_digest(context: dict) -> str:
+    canonical = json.dumps(context, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def test_agent_info_allocations():
+    registry_dict = {"a": AGENT_DICT}
+    registry_slotted = {"a": AgentInfo.from_mapping(AGENT_DICT)}
+
+    # Each tool call used to get a copy of the registry entry
+    copied = allocated_per_call(lambda: dict(registry_dict["a"]))
+    shared = allocated_per_call(lambda: registry_slotted["a"])
+    # Building an instance per call still costs less than a dict
+    built_dict = allocated_per_call(lambda: dict(AGENT_DICT))
+    built_slotted = allocated_per_call(lambda: AgentInfo(**AGENT_DICT))
+
+    print(
+        f"\nagent info per call: dict copy {copied:.0f}B, shared AgentInfo {shared:.0f}B; "
+        f"new dict {built_dict:.0f}B, new AgentInfo {built_slotted:.0f}B"
+    )
+    assert shared < copied / 10
+    assert built_slotted < built_dict
+
+
+def test_policy_context_allocations():
+    # A check derives the context hash for the decision cache key and again
+    # for the coalescing key
+    def dict_keys():
+        return dict_digest(CONTEXT), dict_digest(CONTEXT)
+
+    def context_keys():
+        context = PolicyContext(CONTEXT)
+        return context.digest(), context.digest()
+
+    hashed_twice = allocated_per_call(dict_keys)
+    hashed_once = allocated_per_call(context_keys)
+
+    context = PolicyContext(CONTEXT)
+    context.digest()
+    repeat = allocated_per_call(context.digest)
+
+    print(
+        f"\npolicy context per check: dict {hashed_twice:.0f}B, PolicyContext {hashed_once:.0f}B, "
+        f"repeated digest {repeat:.0f}B"
+    )
+    assert hashed_once < hashed_twice
+    assert repeat < 16
+    assert context.digest() == dict_digest(CONTEXT)
@@ -0,0 +1,143 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from ironbook_sdk import PolicyInput
+
+from fastmcp_ironbook import AgentInfo, DecisionBatcher, UpstreamScheduler
+from fastmcp_ironbook.policy import enforce_policy
+
+AGENT = AgentInfo(agent_did="did:web:agents.example.com:a", vc="vc", agent_name="a")
+
+
+def policy_input(i: int) -> PolicyInput:
+    return PolicyInput(agent_did="did:web:agents.example.com:a", policy_id="policy_1", token=f"t{i}", context={"i": i})
+
+
+class BatchClient:
+    def __init__(self):
+        self.batches = []
+
+    async def decide_many(self, inputs):
+        self.batches.append(len(inputs))
+        return [SimpleNamespace(allow=policy_input.context["i"] % 2 == 0) for policy_input in inputs]
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    client = BatchClient()
+    batcher = DecisionBatcher(window_ms=10_000, max_batch=4, batch_method="decide_many")
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.decide(client, policy_input(i)) for i in range(8))), 1.0
+        )
+
+    decisions = asyncio.run(main())
+    assert [decision.allow for decision in decisions] == [True, False] * 4
+    assert client.batches == [4, 4]
+    assert batcher.stats() == {"batches": 2, "decisions": 8, "mean_batch_size": 4.0}
+
+
+def test_partial_batch_flushes_after_the_window():
+    client = BatchClient()
+    batcher = DecisionBatcher(window_ms=5, max_batch=64, batch_method="decide_many")
+
+    async def main():
+        first = await asyncio.gather(*(batcher.decide(client, policy_input(i)) for i in range(3)))
+        second = await batcher.decide(client, policy_input(3))
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert len(first) == 3
+    assert second.allow is False
+    assert client.batches == [3, 1]
+
+
+def test_default_sends_single_decisions_concurrently(client):
+    batcher = DecisionBatcher(window_ms=1)
+
+    async def main():
+        return await asyncio.gather(*(batcher.decide(client, policy_input(i)) for i in range(5)))
+
+    decisions = asyncio.run(main())
+    assert all(decision.allow for decision in decisions)
+    assert client.calls == {"decision": 5}
+    assert batcher.stats()["batches"] == 1
+
+
+def test_missing_batch_method_fails_the_batch(client):
+    batcher = DecisionBatcher(window_ms=1, batch_method="policy_decisions")
+
+    async def main():
+        return await batcher.decide(client, policy_input(0))
+
+    with pytest.raises(AttributeError, match="policy_decisions"):
+        asyncio.run(main())
+    assert client.calls == {}
+
+
+def test_waiting_for_a_batch_holds_no_scheduler_slot(client):
+    scheduler = UpstreamScheduler(max_concurrency=4)
+    batcher = DecisionBatcher(window_ms=50, max_batch=64)
+    batches = []
+
+    async def policy_decisions(inputs):
+        batches.append(len(inputs))
+        return [SimpleNamespace(allow=True) for _ in inputs]
+
+    client.policy_decisions = policy_decisions
+
+    async def check(i):
+        return await enforce_policy(
+            client, AGENT, "read", "mcp://test", context={"i": i}, policy_id="policy_1",
+            scheduler=scheduler, batcher=batcher
+        )
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(check(i) for i in range(16)))
+        single = time.perf_counter() - started
+
+        batcher.batch_method = "policy_decisions"
+        await asyncio.gather(*(check(i) for i in range(16, 32)))
+        return single
+
+    single = asyncio.run(main())
+    # One window plus four rounds of single decisions through four slots,
+    # not four windows of four
+    assert batcher.stats()["batches"] == 2
+    assert batches == [16]
+    assert single < 0.15
+    assert client.calls["decision"] == 16
+
+
+def test_window_latency_sweep(client):
+    client.delay = 0.005
+    checks = 64
+
+    async def run(window_ms):
+        batcher = DecisionBatcher(window_ms=window_ms)
+        latencies = []
+
+        async def check(i):
+            await asyncio.sleep(i * 0.0005)  # staggered arrivals
+            started = time.perf_counter()
+            await batcher.decide(client, policy_input(i))
+            latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(check(i) for i in range(checks)))
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[int(len(latencies) * 0.99)]
+        return batcher.stats()["batches"], p50, p99
+
+    results = {window_ms: asyncio.run(run(window_ms)) for window_ms in (0, 1, 5, 20)}
+    print()
+    for window_ms, (batches, p50, p99) in results.items():
+        print(f"window {window_ms:>2}ms: {batches:>2} batches, p50 {p50 * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms")
+
+    batch_counts = [batches for batches, _, _ in results.values()]
+    assert batch_counts == sorted(batch_counts, reverse=True)
+    assert batch_counts[-1] < batch_counts[0]
+    assert results[20][1] > results[0][1]
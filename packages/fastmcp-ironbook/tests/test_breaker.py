@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from fastmcp_ironbook import (
+    AgentInfo,
+    CircuitBreaker,
+    CircuitOpenError,
+    DecisionCache,
+    LocalPolicyEvaluator,
+    PolicyBundleStore,
+)
+from fastmcp_ironbook.policy import enforce_policy
+
+AGENT = AgentInfo(agent_did="did:web:agents.example.com:a", vc="vc", agent_name="a")
+
+SOURCE = """
+package ironbook
+
+default allow := false
+
+allow if {
+    input.action == "read"
+}
+"""
+
+
+async def ok():
+    return "ok"
+
+
+async def fail():
+    raise ConnectionError("upstream down")
+
+
+def check(client, action="read", **kwargs):
+    return enforce_policy(client, AGENT, action, "mcp://test", policy_id="policy_1", **kwargs)
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(window=4, min_calls=4, open_seconds=0.05)
+
+    async def main():
+        for _ in range(2):
+            assert await breaker.call(ok) == "ok"
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await breaker.call(fail)
+        assert breaker.state == "open"
+
+        called = []
+        with pytest.raises(CircuitOpenError) as rejected:
+            await breaker.call(lambda: called.append(1))
+        assert called == []
+        assert 0 < rejected.value.retry_after <= 0.05
+
+        # A failed probe opens the circuit again
+        await asyncio.sleep(0.06)
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+        assert breaker.state == "open"
+
+        await asyncio.sleep(0.06)
+        assert await breaker.call(ok) == "ok"
+        assert breaker.state == "closed"
+
+    asyncio.run(main())
+    stats = breaker.stats()
+    assert stats["opens"] == 2
+    assert stats["rejections"] == 1
+    assert stats["failures"] == 3
+
+
+def test_half_open_admits_one_probe_at_a_time():
+    breaker = CircuitBreaker(window=1, min_calls=1, open_seconds=0.01)
+
+    async def slow_ok():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def main():
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+        await asyncio.sleep(0.02)
+        return await asyncio.gather(
+            breaker.call(slow_ok), breaker.call(slow_ok), return_exceptions=True
+        )
+
+    probe, rejected = asyncio.run(main())
+    assert probe == "ok"
+    assert isinstance(rejected, CircuitOpenError)
+    assert breaker.state == "closed"
+
+
+def test_fail_mode_closed_denies(client):
+    client.decision_error = ConnectionError("upstream down")
+    breaker = CircuitBreaker(fail_mode="closed")
+
+    with pytest.raises(PermissionError, match="Policy service unavailable"):
+        asyncio.run(check(client, circuit_breaker=breaker))
+    assert client.calls["decision"] == 1
+
+
+def test_open_circuit_denies_without_calling_upstream(client):
+    client.decision_error = ConnectionError("upstream down")
+    breaker = CircuitBreaker(window=2, min_calls=2, open_seconds=60)
+
+    async def main():
+        for _ in range(3):
+            with pytest.raises(PermissionError):
+                await check(client, circuit_breaker=breaker)
+
+    asyncio.run(main())
+    assert breaker.state == "open"
+    assert breaker.stats()["rejections"] == 1
+    assert client.calls["decision"] == 2
+
+
+def test_fail_mode_stale_serves_expired_decisions(client):
+    cache = DecisionCache(allow_ttl=0.01, max_stale=60)
+    breaker = CircuitBreaker(fail_mode="stale")
+
+    async def main():
+        assert await check(client, decision_cache=cache, circuit_breaker=breaker)
+        await asyncio.sleep(0.02)
+        client.decision_error = ConnectionError("upstream down")
+        assert await check(client, decision_cache=cache, circuit_breaker=breaker)
+        # Nothing cached for this context: fail closed
+        with pytest.raises(PermissionError, match="Policy service unavailable"):
+            await check(client, context={"other": 1}, decision_cache=cache, circuit_breaker=breaker)
+
+    asyncio.run(main())
+    assert client.calls["decision"] == 3
+
+
+def test_fail_mode_local_evaluates_in_process(client, tmp_path):
+    path = tmp_path / "policy_1.rego"
+    path.write_text(SOURCE)
+    client.decision_error = ConnectionError("upstream down")
+    breaker = CircuitBreaker(policy_fail_modes={"policy_1": "local"})
+    evaluator = LocalPolicyEvaluator(
+        store=PolicyBundleStore(sources={"policy_1": str(path)}, cache_dir=str(tmp_path / "cache")),
+        mode="shadow"
+    )
+
+    async def main():
+        assert await check(client, circuit_breaker=breaker, local_evaluator=evaluator)
+        with pytest.raises(PermissionError, match="Policy denied access"):
+            await check(client, "write", circuit_breaker=breaker, local_evaluator=evaluator)
+
+    asyncio.run(main())
+    assert client.calls["decision"] == 2
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from fastmcp_ironbook import AgentInfo, CircuitBreaker, Deadline, DeadlineExceededError, IronBookGuard
+from fastmcp_ironbook.concurrency import SingleFlight
+from fastmcp_ironbook.policy import enforce_policy
+
+AGENT = AgentInfo(agent_did="did:web:agents.example.com:a", vc="vc", agent_name="a")
+
+
+def test_deadline_is_not_a_breaker_failure(client):
+    client.delay = 0.05
+    breaker = CircuitBreaker(window=4, min_calls=2)
+
+    async def main():
+        for _ in range(4):
+            with pytest.raises(DeadlineExceededError):
+                await enforce_policy(
+                    client, AGENT, "read", "mcp://test", policy_id="policy_1",
+                    circuit_breaker=breaker, deadline=Deadline(0.01)
+                )
+
+    asyncio.run(main())
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_shared_evaluation_outlives_the_caller_that_started_it(client):
+    client.delay = 0.03
+    coalescer = SingleFlight()
+
+    async def check(budget):
+        return await enforce_policy(
+            client, AGENT, "read", "mcp://test", policy_id="policy_1",
+            coalescer=coalescer, deadline=Deadline(budget)
+        )
+
+    async def main():
+        return await asyncio.gather(check(0.01), check(1.0), return_exceptions=True)
+
+    short, long = asyncio.run(main())
+    assert isinstance(short, DeadlineExceededError)
+    assert long is True
+    assert client.calls == {"token": 1, "decision": 1}
+
+
+def test_shared_registration_outlives_the_caller_that_started_it(client):
+    client.delay = 0.03
+    guard = IronBookGuard(ironbook_client=client)
+    guard.client_info_cache["default"] = {"name": "A", "version": "1", "capabilities": {}}
+
+    async def main():
+        first = asyncio.create_task(guard.get_agent(deadline=Deadline(0.01)))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(guard.get_agent(deadline=Deadline(1.0)))
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    short, agent_info = asyncio.run(main())
+    assert isinstance(short, DeadlineExceededError)
+    assert agent_info.agent_name == "a-agent-v1-org1"
+    assert client.calls == {"org": 1, "register": 1}
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from fastmcp_ironbook import AdaptiveLimiter, AgentInfo, LoadShedError
+from fastmcp_ironbook.policy import enforce_policy
+
+AGENT = AgentInfo(agent_did="did:web:agents.example.com:a", vc="vc", agent_name="a")
+
+
+def test_sheds_beyond_the_limit(client):
+    client.delay = 0.02
+    limiter = AdaptiveLimiter(initial_limit=4)
+
+    async def check(i):
+        return await enforce_policy(
+            client, AGENT, "read", "mcp://test", context={"i": i}, policy_id="policy_1",
+            limiter=limiter
+        )
+
+    async def main():
+        return await asyncio.gather(*(check(i) for i in range(10)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    shed = [r for r in results if isinstance(r, LoadShedError)]
+    assert results.count(True) == 4
+    assert len(shed) == 6
+    assert all(error.retry_after > 0 for error in shed)
+    assert limiter.stats()["shed"] == 6
+    assert client.calls["decision"] == 4
+
+
+def test_failures_lower_the_limit_and_success_recovers():
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=2, backoff_ratio=0.5)
+
+    async def fail():
+        raise ConnectionError("upstream down")
+
+    async def ok():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def main():
+        for _ in range(5):
+            with pytest.raises(ConnectionError):
+                await limiter.run(fail)
+            # Back-off happens at most once per round trip
+            await asyncio.sleep(0.001)
+        lowered, drops = limiter.limit, limiter.drops
+
+        # Saturating calls at the baseline latency grow the limit again
+        for _ in range(20):
+            await asyncio.gather(*(limiter.run(ok) for _ in range(limiter.limit)))
+        return lowered, drops
+
+    lowered, drops = asyncio.run(main())
+    assert lowered == 2
+    assert drops == 5
+    assert limiter.limit > 4
+
+
+def test_injected_latency_backs_off_and_sheds(client):
+    client.delay = 0.005
+    limiter = AdaptiveLimiter(initial_limit=16, backoff_ratio=0.5)
+    offered = 24
+
+    async def wave(i):
+        results = await asyncio.gather(*(
+            enforce_policy(
+                client, AGENT, "read", "mcp://test", context={"wave": i, "n": n},
+                policy_id="policy_1", limiter=limiter
+            )
+            for n in range(offered)
+        ), return_exceptions=True)
+        return sum(isinstance(r, LoadShedError) for r in results)
+
+    async def phase(first, waves):
+        shed = 0
+        for i in range(first, first + waves):
+            shed += await wave(i)
+        return shed, limiter.limit
+
+    async def main():
+        fast = await phase(0, 10)
+        # Upstream slows down 10x
+        client.delay = 0.05
+        slow = await phase(10, 10)
+        return fast, slow
+
+    (fast_shed, fast_limit), (slow_shed, slow_limit) = asyncio.run(main())
+    print(
+        f"\nbaseline: limit {fast_limit}, shed {fast_shed}/{10 * offered}; "
+        f"injected latency: limit {slow_limit}, shed {slow_shed}/{10 * offered}; "
+        f"drops {limiter.drops}"
+    )
+
+    assert limiter.drops > 0
+    assert slow_limit < fast_limit
+    assert slow_shed > fast_shed
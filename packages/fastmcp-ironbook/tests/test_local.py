@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from ironbook_sdk.types import Policy
+
+from fastmcp_ironbook import LocalPolicyEvaluator, PolicyBundleStore, RegoError, RegoPolicy
+
+SOURCE = """
+package ironbook
+
+default allow := false
+
+allow if {
+    input.action == "read"
+}
+"""
+
+
+class PolicyClient:
+    def __init__(self):
+        self.fetched = []
+
+    async def get_policy(self, policy_id):
+        self.fetched.append(policy_id)
+        return Policy(agent_did="did:web:agents.example.com:a", policy_id=policy_id, policy_content=SOURCE)
+
+
+def test_store_reads_sdk_policy_content(tmp_path):
+    client = PolicyClient()
+    store = PolicyBundleStore(cache_dir=str(tmp_path))
+
+    async def main():
+        evaluator = LocalPolicyEvaluator(store=store)
+        agent_info = {"agent_did": "did:web:agents.example.com:a"}
+        allowed, _ = await evaluator.decide(client, agent_info, "read", "mcp://test", None, "policy_1")
+        denied, _ = await evaluator.decide(client, agent_info, "write", "mcp://test", None, "policy_1")
+        return allowed, denied
+
+    assert asyncio.run(main()) == (True, False)
+    assert client.fetched == ["policy_1"]
+    assert (tmp_path / "policy_1.rego").read_text() == SOURCE
+
+
+def test_async_audit_deliveries_complete():
+    records = []
+
+    async def audit(record):
+        await asyncio.sleep(0)
+        records.append(record["action"])
+
+    async def main():
+        evaluator = LocalPolicyEvaluator(
+            store=PolicyBundleStore(sources={}), audit_fn=audit
+        )
+        evaluator._audit({"action": "read"})
+        assert len(evaluator._audit_tasks) == 1
+        await asyncio.sleep(0.01)
+        return evaluator
+
+    evaluator = asyncio.run(main())
+    assert records == ["read"]
+    assert not evaluator._audit_tasks
+
+
+def test_wildcard_refs_are_rejected():
+    deny = 'package ironbook\ndefault allow := true\ndeny if { input.context.roles[_] == "banned" }\n'
+    allow = 'package ironbook\ndefault allow := false\nallow if { input.context.roles[_] == "admin" }\n'
+    for source in (deny, allow):
+        with pytest.raises(RegoError):
+            RegoPolicy(source)
+
+    with pytest.raises(RegoError):
+        RegoPolicy('package ironbook\nallow if { input.context.roles[i] == "admin" }\n')
+
+
+def test_some_in_iterates_for_deny_and_allow():
+    deny = RegoPolicy(
+        'package ironbook\ndefault allow := true\n'
+        'deny if {\n    some role in input.context.roles\n    role == "banned"\n}\n'
+    )
+    allow = RegoPolicy(
+        'package ironbook\ndefault allow := false\n'
+        'allow if {\n    some role in input.context.roles\n    role == "admin"\n}\n'
+    )
+
+    assert deny.evaluate({"context": {"roles": ["user", "banned"]}})[0] is False
+    assert deny.evaluate({"context": {"roles": ["user"]}})[0] is True
+    assert allow.evaluate({"context": {"roles": ["user", "admin"]}})[0] is True
+    assert allow.evaluate({"context": {"roles": ["user"]}})[0] is False
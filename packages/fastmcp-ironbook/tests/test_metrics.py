@@ -0,0 +1,51 @@
+import asyncio
+
+from fastmcp_ironbook import (
+    AgentInfo,
+    CircuitBreaker,
+    IronBookGuard,
+    IronBookMetrics,
+    TokenPool,
+    UpstreamScheduler,
+)
+
+AGENT = AgentInfo(agent_did="did:web:agents.example.com:a", vc="vc", agent_name="a")
+
+
+def samples(text: str) -> dict:
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+
+
+def test_render_exports_guard_components(client):
+    metrics = IronBookMetrics()
+    breaker = CircuitBreaker()
+    scheduler = UpstreamScheduler(max_concurrency=4)
+    pool = TokenPool(depth=0)
+    IronBookGuard(
+        ironbook_client=client, circuit_breaker=breaker, scheduler=scheduler,
+        token_pool=pool, metrics=metrics
+    )
+
+    async def main():
+        for _ in range(2):
+            await pool.acquire(client, AGENT, "read", "mcp://test", scheduler)
+
+    asyncio.run(main())
+    rendered = samples(metrics.render())
+
+    assert rendered['fastmcp_ironbook_circuit_breaker_state{state="closed"}'] == "1"
+    assert rendered['fastmcp_ironbook_circuit_breaker_state{state="open"}'] == "0"
+    assert rendered["fastmcp_ironbook_circuit_breaker_opens_total"] == "0"
+    assert rendered['fastmcp_ironbook_scheduler_wait_seconds_bucket{le="+Inf"}'] == "2"
+    assert rendered["fastmcp_ironbook_scheduler_queue_depth_count"] == "2"
+    assert rendered["fastmcp_ironbook_scheduler_in_flight"] == "0"
+    assert rendered['fastmcp_ironbook_token_pool_total{result="hit"}'] == "0"
+    assert rendered['fastmcp_ironbook_token_pool_total{result="miss"}'] == "2"
+
+
+def test_render_without_components_has_only_check_metrics():
+    rendered = IronBookMetrics().render()
+
+    assert "circuit_breaker" not in rendered
+    assert "scheduler" not in rendered
+    assert "token_pool" not in rendered
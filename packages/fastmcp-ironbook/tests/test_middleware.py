@@ -0,0 +1,174 @@
+import asyncio
+import gc
+
+import pytest
+from fastmcp import Client, Context, FastMCP
+from fastmcp.exceptions import ToolError
+from mcp.types import Implementation
+
+from fastmcp_ironbook import (
+    ClientInfoMiddleware,
+    DecisionCache,
+    IronBookGuard,
+    IronBookMetrics,
+    IronBookPolicyMiddleware,
+    ToolPolicy,
+    UnknownSessionError,
+)
+
+
+def make_server(client):
+    guard = IronBookGuard(ironbook_client=client)
+    mcp = FastMCP("test")
+    middleware = ClientInfoMiddleware(guard.client_info_cache)
+    mcp.add_middleware(middleware)
+
+    @mcp.tool
+    async def whoami(ctx: Context) -> str:
+        agent_info = await guard.get_agent()
+        return f"{ctx.session_id} {agent_info.agent_name}"
+
+    return mcp, guard
+
+
+def test_sessions_are_identified_independently(client):
+    mcp, guard = make_server(client)
+
+    async def call(name):
+        async with Client(mcp, client_info=Implementation(name=name, version="1.0")) as session:
+            first = (await session.call_tool("whoami", {})).data
+            second = (await session.call_tool("whoami", {})).data
+            assert first == second
+            return first.split(" ")
+
+    async def main():
+        return await asyncio.gather(call("Alpha"), call("Beta"))
+
+    (alpha_session, alpha_agent), (beta_session, beta_agent) = asyncio.run(main())
+
+    assert alpha_session != beta_session
+    assert alpha_agent == "alpha-agent-v1.0-org1"
+    assert beta_agent == "beta-agent-v1.0-org1"
+    assert "default" not in guard.client_info_cache
+
+
+def test_session_entries_are_evicted(client):
+    mcp, guard = make_server(client)
+
+    async def main():
+        async with Client(mcp, client_info=Implementation(name="Alpha", version="1.0")) as session:
+            await session.call_tool("whoami", {})
+            assert len(guard.client_info_cache) == 1
+
+    asyncio.run(main())
+    gc.collect()
+
+    assert guard.client_info_cache == {}
+
+
+def test_unknown_session_is_denied(client):
+    guard = IronBookGuard(ironbook_client=client)
+    guard.client_info_cache["default"] = {"name": "Other", "version": "1.0", "capabilities": {}}
+
+    with pytest.raises(UnknownSessionError):
+        asyncio.run(guard.get_agent(session_id="unknown"))
+    assert client.calls == {}
+
+
+def test_context_fn_errors_reject_the_call(client):
+    guard = IronBookGuard(ironbook_client=client)
+    mcp = FastMCP("test")
+    mcp.add_middleware(ClientInfoMiddleware(guard.client_info_cache))
+    mcp.add_middleware(IronBookPolicyMiddleware(guard, {
+        "divide": ToolPolicy(policy_id="policy_1", context_fn=lambda a, b: {"ratio": a / b}),
+    }))
+    ran = []
+
+    @mcp.tool
+    def divide(a: int, b: int) -> int:
+        ran.append((a, b))
+        return 0
+
+    async def main():
+        async with Client(mcp) as session:
+            with pytest.raises(ToolError, match="Invalid arguments"):
+                await session.call_tool("divide", {"a": 1, "b": 0})
+
+    asyncio.run(main())
+    assert ran == []
+    assert "decision" not in client.calls
+
+
+def test_middleware_entry_does_not_bypass_decorator_policy(client):
+    mcp = FastMCP("test")
+    guard = IronBookGuard(mcp_server=mcp, ironbook_client=client)
+    mcp.add_middleware(ClientInfoMiddleware(guard.client_info_cache))
+    mcp.add_middleware(IronBookPolicyMiddleware(guard, {"admin": ToolPolicy(policy_id="lenient")}))
+    contexts = []
+
+    @mcp.tool
+    @guard.require_policy(lambda user: contexts.append(user) or {"user": user}, policy_id="strict")
+    async def admin(user: str) -> str:
+        return user
+
+    @mcp.tool
+    @guard.require_policy(policy_id="registered")
+    async def report() -> str:
+        return "ok"
+
+    async def main():
+        async with Client(mcp) as session:
+            assert (await session.call_tool("admin", {"user": "u1"})).data == "u1"
+            assert (await session.call_tool("report", {})).data == "ok"
+
+    asyncio.run(main())
+    assert client.policy_ids == ["lenient", "strict", "registered"]
+    assert contexts == ["u1"]
+
+
+def test_list_tools_hides_denied_tools_without_counting_calls(client):
+    client.denied_policy_ids.add("policy_secret")
+    metrics = IronBookMetrics()
+    mcp = FastMCP("test")
+    guard = IronBookGuard(
+        mcp_server=mcp, ironbook_client=client, decision_cache=DecisionCache(), metrics=metrics
+    )
+    mcp.add_middleware(ClientInfoMiddleware(guard.client_info_cache))
+    mcp.add_middleware(IronBookPolicyMiddleware(guard, {
+        "report": ToolPolicy(policy_id="policy_open"),
+        "secret": ToolPolicy(policy_id="policy_secret"),
+        "search": ToolPolicy(policy_id="policy_secret", context_fn=lambda query: {"query": query}),
+    }, filter_tools=True))
+
+    @mcp.tool
+    def report() -> str:
+        return "ok"
+
+    @mcp.tool
+    def secret() -> str:
+        return "hidden"
+
+    @mcp.tool
+    def search(query: str) -> str:
+        return query
+
+    async def main():
+        async with Client(mcp) as session:
+            listed = sorted(tool.name for tool in await session.list_tools())
+            decisions = client.calls["decision"]
+            assert (await session.call_tool("report", {})).data == "ok"
+            return listed, decisions
+
+    listed, prefetched = asyncio.run(main())
+    rendered = metrics.render()
+
+    # search depends on its arguments, so it is listed and checked at call time
+    assert listed == ["report", "search"]
+    assert prefetched == 2
+    # The prefetched allow is cached for the call
+    assert client.calls["decision"] == 2
+    assert 'prefetch_decisions_total{tool="report",policy_id="policy_open",outcome="allow"} 1' in rendered
+    assert 'prefetch_decisions_total{tool="secret",policy_id="policy_secret",outcome="deny"} 1' in rendered
+    assert 'decisions_total{tool="secret"' not in rendered.replace("prefetch_decisions_total", "")
+    assert 'decisions_total{tool="report",policy_id="policy_open",outcome="allow"} 1' in rendered
+    assert 'check_duration_seconds_count{tool="report",policy_id="policy_open"} 1' in rendered
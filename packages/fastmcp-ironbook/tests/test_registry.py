@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from fastmcp_ironbook import AgentInfo, SQLiteAgentRegistry
+
+
+def agent(name: str) -> AgentInfo:
+    return AgentInfo(agent_did=f"did:web:agents.example.com:{name}", vc="vc", agent_name=name)
+
+
+def test_registrations_survive_reopen(tmp_path):
+    path = str(tmp_path / "agents.db")
+    registry = SQLiteAgentRegistry(path)
+    registry["alpha"] = agent("alpha")
+    registry["degraded"] = AgentInfo(agent_did="did:web:agents.example.com:degraded")
+    registry.close()
+
+    reopened = SQLiteAgentRegistry(path)
+    try:
+        assert reopened["alpha"] == agent("alpha")
+        assert "degraded" not in reopened
+        assert list(reopened) == ["alpha"]
+    finally:
+        reopened.close()
+
+
+def test_lookups_do_not_query_the_database(tmp_path, monkeypatch):
+    registry = SQLiteAgentRegistry(str(tmp_path / "agents.db"))
+
+    def fail(*args):
+        raise AssertionError("database queried on lookup")
+
+    monkeypatch.setattr(registry, "_connect", fail)
+    for _ in range(3):
+        assert "unknown" not in registry
+        with pytest.raises(KeyError):
+            registry["unknown"]
+
+
+def test_expired_registrations_are_ignored(tmp_path):
+    path = str(tmp_path / "agents.db")
+    registry = SQLiteAgentRegistry(path)
+    registry["alpha"] = agent("alpha")
+    registry.close()
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE agents SET updated_at = 0")
+
+    reopened = SQLiteAgentRegistry(path, max_age=60)
+    try:
+        assert "alpha" not in reopened
+        assert len(reopened) == 0
+    finally:
+        reopened.close()
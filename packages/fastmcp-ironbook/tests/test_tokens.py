@@ -0,0 +1,76 @@
+import asyncio
+
+from fastmcp_ironbook import AgentInfo, TokenPool, UpstreamScheduler
+
+AGENT = AgentInfo(agent_did="did:web:agents.example.com:a", vc="vc", agent_name="a")
+
+
+async def filled(pool, ready):
+    for _ in range(100):
+        if pool.stats()["ready_tokens"] >= ready:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("token pool was not refilled")
+
+
+def test_close_right_after_a_hit_does_not_hang(client):
+    pool = TokenPool(depth=2)
+
+    async def main():
+        miss = await pool.acquire(client, AGENT, "read", "mcp://test")
+        await filled(pool, 2)
+        hit = await pool.acquire(client, AGENT, "read", "mcp://test")
+        await asyncio.wait_for(pool.close(), 1.0)
+        return miss, hit
+
+    miss, hit = asyncio.run(main())
+    assert (miss, hit) == ("token-1", "token-2")
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["misses"] == 1
+
+
+def test_pool_mints_go_through_the_scheduler(client):
+    scheduler = UpstreamScheduler(max_concurrency=1)
+    pool = TokenPool(depth=2)
+
+    async def main():
+        await pool.acquire(client, AGENT, "read", "mcp://test", scheduler, priority=5)
+        await filled(pool, 2)
+        await pool.close()
+
+    asyncio.run(main())
+    assert client.calls["token"] == 3
+    assert scheduler.dispatched == 3
+
+
+def test_refills_wait_behind_policy_checks(client):
+    scheduler = UpstreamScheduler(max_concurrency=1)
+    pool = TokenPool(depth=1)
+    order = []
+
+    async def upstream_call(name):
+        order.append(name)
+        await asyncio.sleep(0.01)
+
+    get_auth_token = client.get_auth_token
+
+    async def refill_token(options):
+        order.append("refill")
+        return await get_auth_token(options)
+
+    client.get_auth_token = refill_token
+
+    async def main():
+        # Hold the only slot so the refill and the check both queue
+        blocker = asyncio.create_task(scheduler.run(lambda: upstream_call("blocker"), "other"))
+        await asyncio.sleep(0)
+        await pool.warm(client, AGENT, "read", "mcp://test", scheduler)
+        await asyncio.sleep(0)
+        check = asyncio.create_task(scheduler.run(lambda: upstream_call("check"), AGENT.agent_did))
+        await asyncio.gather(blocker, check)
+        await filled(pool, 1)
+        await pool.close()
+
+    asyncio.run(main())
+    # The refill queued first, but runs after the check
+    assert order == ["blocker", "check", "refill"]